@@ -1,90 +1,48 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
-from jose import JWTError, jwt
-from datetime import datetime, timedelta
-from typing import Optional
-import json
+from sqlalchemy.orm import Session, joinedload
 
 from app.database import get_db
 from app import models
 
-import os
-from dotenv import load_dotenv
+from app.auth_core import (
+    ADMIN_INACTIVE_EXCEPTION, ADMIN_REQUIRED_EXCEPTION, CREDENTIALS_EXCEPTION, SUPER_ADMIN_REQUIRED_EXCEPTION, AuthError,
+    decode_token
+)
 
-# Load environment variables
-load_dotenv()
-
-# Security configuration
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")  # Change this in production
-ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
 def verify_token(token: str):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
-        return email
-    except JWTError:
+        return decode_token(token)["sub"]
+    except AuthError:
         return None
 
 def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
     """Get current admin user from JWT token - works with unified login"""
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
     token = credentials.credentials
     email = verify_token(token)
     if email is None:
-        raise credentials_exception
+        raise CREDENTIALS_EXCEPTION.with_traceback(None)
     
     # Check if this email belongs to an admin
-    admin = db.query(models.Admin).filter(models.Admin.email == email).first()
+    # Permission rows are joined in so check_permission needs no further query
+    admin = db.query(models.Admin).options(
+        joinedload(models.Admin.permission_entries)
+    ).filter(models.Admin.email == email).first()
     if admin is None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Admin access required"
-        )
+        raise ADMIN_REQUIRED_EXCEPTION.with_traceback(None)
     
     if admin.is_active != "active":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Admin account is not active"
-        )
+        raise ADMIN_INACTIVE_EXCEPTION.with_traceback(None)
     
     return admin
 
 def get_current_super_admin(current_admin: models.Admin = Depends(get_current_admin)):
     if current_admin.role != "super_admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Super admin access required"
-        )
+        raise SUPER_ADMIN_REQUIRED_EXCEPTION.with_traceback(None)
     return current_admin
 
 def check_permission(permission: str):
@@ -92,17 +50,10 @@ def check_permission(permission: str):
         if current_admin.role == "super_admin":
             return current_admin
         
-        try:
-            permissions = json.loads(current_admin.permissions or "[]")
-            if permission not in permissions:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail=f"Permission '{permission}' required"
-                )
-        except json.JSONDecodeError:
+        if permission not in current_admin.permissions_set:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
-                detail="Invalid permissions configuration"
+                detail=f"Permission '{permission}' required"
             )
         
         return current_admin
@@ -1,139 +1,104 @@
-from datetime import datetime, timedelta
+from datetime import timedelta
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+import asyncio
+import time
+import jwt
+from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import and_, literal, select
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app import models
-
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Admin routes registered on the user routers share the admin dependency
+from app.admin_auth import get_current_admin
+from app.auth_core import (
+    ALGORITHM, CREDENTIALS_EXCEPTION, REFRESH_TOKEN_EXCEPTION, SECRET_KEY, AuthError,
+    create_access_token, decode_token, get_password_hash, pwd_context
+)
 
 # JWT settings
-SECRET_KEY = "your-secret-key-here-change-in-production"
-ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/users/login")
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def authenticate_user_or_admin(email: str, password: str, db: Session):
+async def authenticate_user_or_admin(email: str, password: str, db: Session):
     """Authenticate either a user or admin with email and password"""
-    # First try to find a user
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if user and user.status == "active":
-        if verify_password(password, user.hashed_password):
-            return {"type": "user", "data": user}
+    # Look up both tables in one round trip; only the matching principal is loaded in full
+    candidates = db.execute(
+        select(literal("user").label("kind"), models.User.id, models.User.hashed_password, models.User.status)
+        .where(models.User.email == email)
+        .union_all(
+            select(literal("admin"), models.Admin.id, models.Admin.hashed_password, models.Admin.is_active)
+            .where(models.Admin.email == email)
+        )
+    ).all()
     
-    # If not a user, try to find an admin
-    admin = db.query(models.Admin).filter(models.Admin.email == email).first()
-    if admin and admin.is_active == "active":
-        if verify_password(password, admin.hashed_password):
-            return {"type": "admin", "data": admin}
+    # Users take precedence over admins sharing the same email
+    for kind, principal_id, hashed_password, principal_status in sorted(candidates, key=lambda c: c.kind != "user"):
+        if principal_status != "active":
+            continue
+        # Hash verification is CPU-bound, keep it off the event loop
+        verified, new_hash = await asyncio.to_thread(pwd_context.verify_and_update, password, hashed_password)
+        if not verified:
+            continue
+        principal = db.get(models.User if kind == "user" else models.Admin, principal_id)
+        if new_hash:
+            # Transparently upgrade deprecated hashes on successful login
+            principal.hashed_password = new_hash
+            db.commit()
+        return {"type": kind, "data": principal}
     
     return None
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
 def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire, "type": "refresh"})  # Add type to distinguish refresh token
+    expires_in = expires_delta or timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    to_encode.update({"exp": int(time.time() + expires_in.total_seconds()), "type": "refresh"})  # Add type to distinguish refresh token
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        if payload.get("type") == "refresh":
-            raise credentials_exception  # Prevent refresh tokens from being used as access tokens
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+        # Refresh tokens are rejected here so they cannot be used as access tokens
+        email: str = decode_token(token)["sub"]
+    except AuthError:
+        raise CREDENTIALS_EXCEPTION.with_traceback(None) from None
     user = db.query(models.User).filter(models.User.email == email).first()
     if user is None:
-        raise credentials_exception
+        raise CREDENTIALS_EXCEPTION.with_traceback(None)
     return user
 
+def get_current_user_transaction(transaction_id: int, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    """Authenticate the user and load their transaction `transaction_id` in one query"""
+    try:
+        email: str = decode_token(token)["sub"]
+    except AuthError:
+        raise CREDENTIALS_EXCEPTION.with_traceback(None) from None
+    row = db.query(models.User, models.Transaction).outerjoin(
+        models.Transaction,
+        and_(models.Transaction.user_id == models.User.id, models.Transaction.id == transaction_id)
+    ).filter(models.User.email == email).first()
+    if row is None:
+        raise CREDENTIALS_EXCEPTION.with_traceback(None)
+    if row.Transaction is None:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    return row.Transaction
+
 def verify_refresh_token(token: str, db: Session):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Invalid or expired refresh token",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        if payload.get("type") != "refresh":
-            raise credentials_exception
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+        email: str = decode_token(token, refresh=True)["sub"]
+    except AuthError:
+        raise REFRESH_TOKEN_EXCEPTION.with_traceback(None) from None
     user = db.query(models.User).filter(models.User.email == email).first()
     if user is None or user.status != "active":
-        raise credentials_exception
+        raise REFRESH_TOKEN_EXCEPTION.with_traceback(None)
     return user
 
 def get_current_active_user(current_user: models.User = Depends(get_current_user)):
     return current_user
 
-def get_current_admin(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Get current admin user from JWT token"""
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate admin credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        if payload.get("type") == "refresh":
-            raise credentials_exception
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    admin = db.query(models.Admin).filter(models.Admin.email == email).first()
-    if admin is None:
-        raise credentials_exception
-    
-    if admin.is_active != "active":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Admin account is not active"
-        )
-    
-    return admin
-
 def get_current_active_admin(current_admin: models.Admin = Depends(get_current_admin)):
     """Get current active admin user"""
     return current_admin
\ No newline at end of file
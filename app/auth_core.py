@@ -0,0 +1,105 @@
+from datetime import timedelta
+from typing import Optional
+import hashlib
+import os
+import threading
+import time
+from cachetools import TTLCache
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+import jwt
+from jwt import InvalidTokenError as JWTError
+from passlib.context import CryptContext
+
+# Load environment variables
+load_dotenv()
+
+# Password hashing: argon2 for new hashes, bcrypt kept to verify (and upgrade) legacy hashes
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    default="argon2",
+    deprecated="auto",
+    bcrypt__rounds=int(os.getenv("BCRYPT_ROUNDS", "10")),
+)
+
+# JWT settings shared by user and admin authentication
+SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")  # Change this in production
+ALGORITHM = "HS256"
+
+# Decoded JWT payloads, keyed by token hash, so repeated requests skip jwt.decode
+JWT_CACHE_TTL_SECONDS = 30
+_jwt_cache = TTLCache(maxsize=10000, ttl=JWT_CACHE_TTL_SECONDS)
+_jwt_cache_lock = threading.Lock()
+
+class AuthError(Exception):
+    """Raised when a token is invalid, expired or of the wrong type"""
+
+# Auth failures are shared instances instead of being rebuilt on every request.
+# They are raised via with_traceback(None) so repeated raises don't accumulate frames.
+CREDENTIALS_EXCEPTION = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+REFRESH_TOKEN_EXCEPTION = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Invalid or expired refresh token",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+ADMIN_REQUIRED_EXCEPTION = HTTPException(
+    status_code=status.HTTP_403_FORBIDDEN,
+    detail="Admin access required"
+)
+ADMIN_INACTIVE_EXCEPTION = HTTPException(
+    status_code=status.HTTP_403_FORBIDDEN,
+    detail="Admin account is not active"
+)
+SUPER_ADMIN_REQUIRED_EXCEPTION = HTTPException(
+    status_code=status.HTTP_403_FORBIDDEN,
+    detail="Super admin access required"
+)
+
+def verify_password(plain_password, hashed_password):
+    return pwd_context.verify(plain_password, hashed_password)
+
+def get_password_hash(password):
+    return pwd_context.hash(password)
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    to_encode = data.copy()
+    # exp only needs whole epoch seconds
+    to_encode["exp"] = int(time.time() + (expires_delta.total_seconds() if expires_delta else 15 * 60))
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+def _decode_cached(token: str) -> dict:
+    """Decode a JWT, reusing the payload of a recently verified identical token"""
+    key = hashlib.sha256(token.encode()).hexdigest()[:32]
+    with _jwt_cache_lock:
+        payload = _jwt_cache.get(key)
+    if payload is not None:
+        # Never serve a token from cache past its own expiry
+        if payload.get("exp", 0) > time.time():
+            return payload
+        with _jwt_cache_lock:
+            _jwt_cache.pop(key, None)
+    # Raises JWTError on failure, so invalid tokens are never cached
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    with _jwt_cache_lock:
+        _jwt_cache[key] = payload
+    return payload
+
+def decode_token(token: str, *, refresh: bool = False) -> dict:
+    """Verify a token and return its payload.
+
+    Access tokens are accepted by default; pass refresh=True to accept only refresh tokens.
+    """
+    try:
+        payload = _decode_cached(token)
+    except JWTError:
+        raise AuthError("Invalid or expired token")
+    if (payload.get("type") == "refresh") != refresh:
+        raise AuthError("Wrong token type")
+    if payload.get("sub") is None:
+        raise AuthError("Token has no subject")
+    return payload
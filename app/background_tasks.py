@@ -4,25 +4,44 @@ Background tasks for Web3 deposit monitoring
 """
 
 import asyncio
+import logging
 from sqlalchemy.orm import Session
 from app.database import SessionLocal
 from app.web3_service import web3_service
 from app import models
 
+logger = logging.getLogger(__name__)
+
+DEPOSIT_CHECK_INTERVAL_SECONDS = 30
+DEPOSIT_CHECK_MAX_BACKOFF_SECONDS = 300
+
 async def monitor_web3_deposits():
     """Background task to monitor Web3 deposits"""
+    backoff = DEPOSIT_CHECK_INTERVAL_SECONDS
     while True:
+        # Fresh session per pass so connections go back to the pool between checks
+        db = SessionLocal()
         try:
-            db = SessionLocal()
-            # Use the new monitoring system from web3_service
-            await web3_service.monitor_deposits(db)
+            await web3_service.check_pending_deposits(db)
+            backoff = DEPOSIT_CHECK_INTERVAL_SECONDS
+        except Exception:
+            logger.exception("Error in deposit monitoring")
+            db.rollback()
+            backoff = min(backoff * 2, DEPOSIT_CHECK_MAX_BACKOFF_SECONDS)
+        finally:
             db.close()
-        except Exception as e:
-            print(f"Error in deposit monitoring: {e}")
-            await asyncio.sleep(30)
+        await asyncio.sleep(backoff)
+
+def start_background_tasks() -> asyncio.Task:
+    """Start background tasks on the running event loop"""
+    task = asyncio.create_task(monitor_web3_deposits())
+    print("🚀 Background tasks started")
+    return task
 
-def start_background_tasks():
-    """Start background tasks"""
-    loop = asyncio.get_event_loop()
-    loop.create_task(monitor_web3_deposits())
-    print("🚀 Background tasks started") 
\ No newline at end of file
+async def stop_background_tasks(task: asyncio.Task):
+    """Cancel background tasks and wait for them to finish"""
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
@@ -0,0 +1,104 @@
+"""
+Shared key/value cache.
+
+Uses Redis when REDIS_URL is set so entries are shared by every worker; otherwise
+falls back to a bounded in-process store with the same per-key TTL semantics.
+
+The cache is best-effort: Redis errors are logged and treated as a miss (reads) or
+skipped (writes and deletes), so an outage never fails a request whose real work
+already happened. Async callers use the *_async methods, which run Redis round
+trips in a worker thread instead of on the event loop.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+import orjson
+from typing import Any, Optional
+from cachetools import TLRUCache
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL")
+LOCAL_CACHE_MAXSIZE = 10000
+
+class Cache:
+    def __init__(self, redis_url: Optional[str] = None):
+        self._redis = None
+        self._redis_error = ()
+        if redis_url:
+            import redis
+            self._redis = redis.Redis.from_url(redis_url, socket_timeout=1.0, socket_connect_timeout=1.0)
+            self._redis_error = redis.RedisError
+            logger.info("Cache backed by Redis")
+        # Values are stored as (ttl_seconds, serialized) so each entry expires on its own schedule
+        self._local = TLRUCache(maxsize=LOCAL_CACHE_MAXSIZE, ttu=lambda key, value, now: now + value[0], timer=time.monotonic)
+        self._lock = threading.Lock()
+
+    def get_json(self, key: str) -> Optional[Any]:
+        """Return the decoded value for key, or None if missing or expired"""
+        if self._redis is not None:
+            try:
+                raw = self._redis.get(key)
+            except self._redis_error as e:
+                logger.warning("Cache read of %s failed: %s", key, e)
+                return None
+        else:
+            with self._lock:
+                entry = self._local.get(key)
+            raw = entry[1] if entry is not None else None
+        return orjson.loads(raw) if raw is not None else None
+
+    def set_json(self, key: str, value: Any, ttl: int):
+        """Store value under key for ttl seconds"""
+        # Non-string keys are stringified, as json.dumps did
+        raw = orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+        if self._redis is not None:
+            try:
+                self._redis.set(key, raw, ex=ttl)
+            except self._redis_error as e:
+                logger.warning("Cache write of %s failed: %s", key, e)
+        else:
+            with self._lock:
+                self._local[key] = (ttl, raw)
+
+    def delete(self, *keys: str):
+        """Remove keys if present"""
+        if not keys:
+            return
+        if self._redis is not None:
+            try:
+                self._redis.delete(*keys)
+            except self._redis_error as e:
+                logger.warning("Cache delete of %s failed: %s", ", ".join(keys), e)
+        else:
+            with self._lock:
+                for key in keys:
+                    self._local.pop(key, None)
+
+    async def get_json_async(self, key: str) -> Optional[Any]:
+        """get_json for async callers"""
+        if self._redis is None:
+            return self.get_json(key)
+        return await asyncio.to_thread(self.get_json, key)
+
+    async def set_json_async(self, key: str, value: Any, ttl: int):
+        """set_json for async callers"""
+        if self._redis is None:
+            return self.set_json(key, value, ttl)
+        await asyncio.to_thread(self.set_json, key, value, ttl)
+
+    async def delete_async(self, *keys: str):
+        """delete for async callers"""
+        if self._redis is None:
+            return self.delete(*keys)
+        await asyncio.to_thread(self.delete, *keys)
+
+# Create a global instance
+cache = Cache(REDIS_URL)
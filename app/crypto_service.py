@@ -1,23 +1,77 @@
-import requests
+import asyncio
+import httpx
 import json
-from typing import Dict, List, Optional
+from typing import Awaitable, Callable, Dict, List, Optional
 from datetime import datetime
 import time
 
+from app.cache import cache
+
+# Prices move slowly relative to CoinGecko's free-tier rate limits
+PRICE_CACHE_TTL_SECONDS = 30
+# Fail fast on connect, but allow slower responses; no call may block indefinitely
+REQUEST_TIMEOUT = httpx.Timeout(10.0, connect=3.05)
+
 class CryptoService:
     def __init__(self):
         self.base_url = "https://api.coingecko.com/api/v3"
         self.supported_coins = ["bitcoin", "ethereum", "binancecoin", "cardano", "solana"]
+        # Shared client so TLS connections are kept alive between calls
+        self._client: Optional[httpx.AsyncClient] = None
+        # Upstream fetches in progress, by cache key, so concurrent misses share one request
+        self._inflight: Dict[str, asyncio.Task] = {}
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client, creating it on first use"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=REQUEST_TIMEOUT,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                # Retries only cover connection failures, never a request that reached the server
+                transport=httpx.AsyncHTTPTransport(retries=2),
+                headers={"Accept": "application/json", "User-Agent": "blackgem/1.0"},
+            )
+        return self._client
+    
+    async def close(self):
+        """Close the shared HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
-    def get_crypto_price(self, coin_id: str) -> Optional[float]:
+    async def _cached(self, key: str, fetch: Callable[[], Awaitable]):
+        """Return the cached value for key, fetching and caching it on a miss"""
+        value = await cache.get_json_async(key)
+        if value is not None:
+            return value
+        
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_and_store(key, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one cancelled caller doesn't cancel the fetch for the others
+        return await asyncio.shield(task)
+    
+    async def _fetch_and_store(self, key: str, fetch: Callable[[], Awaitable]):
+        value = await fetch()
+        # Failed lookups are not cached so the next request retries immediately
+        if value:
+            await cache.set_json_async(key, value, PRICE_CACHE_TTL_SECONDS)
+        return value
+    
+    async def get_crypto_price(self, coin_id: str) -> Optional[float]:
         """Get current price of a cryptocurrency"""
+        return await self._cached(f"crypto:price:{coin_id}", lambda: self._fetch_crypto_price(coin_id))
+    
+    async def _fetch_crypto_price(self, coin_id: str) -> Optional[float]:
         try:
             url = f"{self.base_url}/simple/price"
             params = {
                 "ids": coin_id,
                 "vs_currencies": "usd"
             }
-            response = requests.get(url, params=params)
+            response = await self._get_client().get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 return data.get(coin_id, {}).get("usd")
@@ -26,20 +80,41 @@ class CryptoService:
             print(f"Error fetching price for {coin_id}: {e}")
             return None
     
-    def get_crypto_prices(self) -> Dict[str, float]:
+    async def get_crypto_prices(self) -> Dict[str, float]:
         """Get prices for all supported cryptocurrencies"""
+        return await self._cached("crypto:prices", self._fetch_crypto_prices)
+    
+    async def _fetch_crypto_prices(self) -> Dict[str, float]:
+        try:
+            # /simple/price accepts a comma-separated id list, so fetch every coin at once
+            url = f"{self.base_url}/simple/price"
+            params = {
+                "ids": ",".join(self.supported_coins),
+                "vs_currencies": "usd"
+            }
+            response = await self._get_client().get(url, params=params)
+            if response.status_code != 200:
+                return {}
+            data = response.json()
+        except Exception as e:
+            print(f"Error fetching crypto prices: {e}")
+            return {}
+        
         prices = {}
         for coin in self.supported_coins:
-            price = self.get_crypto_price(coin)
+            price = data.get(coin, {}).get("usd")
             if price:
                 prices[coin] = price
         return prices
     
-    def get_crypto_market_data(self, coin_id: str) -> Optional[Dict]:
+    async def get_crypto_market_data(self, coin_id: str) -> Optional[Dict]:
         """Get detailed market data for a cryptocurrency"""
+        return await self._cached(f"crypto:market:{coin_id}", lambda: self._fetch_crypto_market_data(coin_id))
+    
+    async def _fetch_crypto_market_data(self, coin_id: str) -> Optional[Dict]:
         try:
             url = f"{self.base_url}/coins/{coin_id}"
-            response = requests.get(url)
+            response = await self._get_client().get(url)
             if response.status_code == 200:
                 data = response.json()
                 return {
@@ -56,9 +131,9 @@ class CryptoService:
             print(f"Error fetching market data for {coin_id}: {e}")
             return None
     
-    def calculate_investment_value(self, coin_id: str, amount: float) -> Optional[Dict]:
+    async def calculate_investment_value(self, coin_id: str, amount: float) -> Optional[Dict]:
         """Calculate investment value and potential returns"""
-        price = self.get_crypto_price(coin_id)
+        price = await self.get_crypto_price(coin_id)
         if price:
             coins_purchased = amount / price
             return {
@@ -1,17 +1,20 @@
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
-from typing import List, Optional
-from pydantic import EmailStr
+import asyncio
+import aiosmtplib
+from email.message import EmailMessage
+from email.utils import formataddr
+from fastapi_mail import MessageSchema, ConnectionConfig
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from typing import Optional
 import os
 from datetime import datetime
-import os
-from fastapi_mail import FastMail, ConnectionConfig
 from dotenv import load_dotenv
 
-
-
 # Load .env variables
 load_dotenv()
 
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "templates")
+EMAIL_TEMPLATES = ("welcome", "transaction", "security_alert", "investment_insights")
+
 class EmailService:
     def __init__(self):
         self.conf = ConnectionConfig(
@@ -24,29 +27,98 @@ class EmailService:
             MAIL_SSL_TLS=os.getenv("MAIL_SSL_TLS", "False").lower() == "true",
             USE_CREDENTIALS=True,
         )
-        self.fastmail = FastMail(self.conf)
+        # Templates are compiled once; autoescaping keeps user-supplied values out of the markup
+        self._env = Environment(loader=FileSystemLoader(TEMPLATES_DIR), autoescape=select_autoescape(["html"]))
+        self._tpl = {name: self._env.get_template(f"{name}.html") for name in EMAIL_TEMPLATES}
+        # Messages are handed to a background worker so API requests never wait on SMTP
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+    
+    def _build_message(self, message: MessageSchema) -> EmailMessage:
+        """Convert a MessageSchema into a MIME message ready for SMTP"""
+        email_message = EmailMessage()
+        email_message["Subject"] = message.subject
+        email_message["From"] = formataddr((self.conf.MAIL_FROM_NAME, self.conf.MAIL_FROM)) if self.conf.MAIL_FROM_NAME else self.conf.MAIL_FROM
+        email_message["To"] = ", ".join(message.recipients)
+        email_message.set_content(message.body, subtype="html")
+        return email_message
+    
+    async def _connect(self) -> aiosmtplib.SMTP:
+        """Open and authenticate an SMTP connection"""
+        smtp = aiosmtplib.SMTP(
+            hostname=self.conf.MAIL_SERVER,
+            port=self.conf.MAIL_PORT,
+            timeout=self.conf.TIMEOUT,
+            use_tls=self.conf.MAIL_SSL_TLS,
+            start_tls=self.conf.MAIL_STARTTLS,
+            validate_certs=self.conf.VALIDATE_CERTS,
+        )
+        await smtp.connect()
+        if self.conf.USE_CREDENTIALS:
+            await smtp.login(self.conf.MAIL_USERNAME, self.conf.MAIL_PASSWORD.get_secret_value())
+        return smtp
+    
+    async def _smtp_worker(self):
+        """Send queued messages over a single long-lived SMTP connection"""
+        smtp = None
+        try:
+            while True:
+                message, description = await self._queue.get()
+                recipients = ", ".join(message.recipients)
+                try:
+                    email_message = self._build_message(message)
+                    # The server may drop an idle connection, so reconnect and retry once
+                    for attempt in range(2):
+                        try:
+                            if smtp is None or not smtp.is_connected:
+                                smtp = await self._connect()
+                            await smtp.send_message(email_message)
+                            break
+                        except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError):
+                            smtp = None
+                            if attempt:
+                                raise
+                    print(f"✅ {description} sent successfully to {recipients}")
+                except Exception as e:
+                    print(f"❌ Error sending {description} to {recipients}: {str(e)}")
+                    print(f"   Email config: {self.conf.MAIL_USERNAME} -> {self.conf.MAIL_FROM}")
+                finally:
+                    self._queue.task_done()
+        finally:
+            if smtp is not None and smtp.is_connected:
+                try:
+                    await smtp.quit()
+                except Exception:
+                    pass
+    
+    async def _enqueue(self, message: MessageSchema, description: str) -> bool:
+        """Queue a message for the background worker, starting it if needed"""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._smtp_worker())
+        await self._queue.put((message, description))
+        return True
+    
+    async def shutdown(self, timeout: float = 10):
+        """Flush pending emails and stop the background worker"""
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Dropping {self._queue.qsize()} unsent emails on shutdown")
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
     
     async def send_welcome_email(self, user_email: str, user_name: str = None):
         """Send welcome email to new users"""
         subject = "Welcome to Black Germ Investment Platform!"
-        body = f"""
-        <html>
-        <body>
-            <h2>Welcome to Black Germ Investment Platform!</h2>
-            <p>Dear {user_name or 'Investor'},</p>
-            <p>Thank you for joining our secure cryptocurrency investment platform. Your account has been successfully created.</p>
-            <p>Here's what you can do now:</p>
-            <ul>
-                <li>Complete your profile setup</li>
-                <li>Add your wallet address</li>
-                <li>Start your first investment</li>
-                <li>Explore our AI-powered insights</li>
-            </ul>
-            <p>If you have any questions, our support team is here to help.</p>
-            <p>Best regards,<br>Black Germ Team</p>
-        </body>
-        </html>
-        """
+        body = self._tpl["welcome"].render(user_name=user_name)
         
         message = MessageSchema(
             subject=subject,
@@ -55,30 +127,17 @@ class EmailService:
             subtype="html"
         )
         
-        try:
-            await self.fastmail.send_message(message)
-            print(f"✅ Welcome email sent successfully to {user_email}")
-            return True
-        except Exception as e:
-            print(f"❌ Error sending welcome email to {user_email}: {str(e)}")
-            print(f"   Email config: {self.conf.MAIL_USERNAME} -> {self.conf.MAIL_FROM}")
-            return False
+        return await self._enqueue(message, "Welcome email")
     
     async def send_transaction_notification(self, user_email: str, transaction_type: str, amount: float, status: str):
         """Send transaction notification email"""
         subject = f"Transaction {status.title()} - Black Germ Platform"
-        body = f"""
-        <html>
-        <body>
-            <h2>Transaction {status.title()}</h2>
-            <p>Your {transaction_type} transaction has been {status}.</p>
-            <p><strong>Amount:</strong> ${amount:.2f}</p>
-            <p><strong>Date:</strong> {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC</p>
-            <p>You can view your transaction history in your dashboard.</p>
-            <p>Best regards,<br>Black Germ Team</p>
-        </body>
-        </html>
-        """
+        body = self._tpl["transaction"].render(
+            transaction_type=transaction_type,
+            amount=amount,
+            status=status,
+            date=datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        )
         
         message = MessageSchema(
             subject=subject,
@@ -87,29 +146,12 @@ class EmailService:
             subtype="html"
         )
         
-        try:
-            await self.fastmail.send_message(message)
-            print(f"✅ Transaction notification sent successfully to {user_email}")
-            return True
-        except Exception as e:
-            print(f"❌ Error sending transaction email to {user_email}: {str(e)}")
-            print(f"   Email config: {self.conf.MAIL_USERNAME} -> {self.conf.MAIL_FROM}")
-            return False
+        return await self._enqueue(message, "Transaction notification")
     
     async def send_security_alert(self, user_email: str, alert_type: str, details: str):
         """Send security alert email"""
         subject = f"Security Alert - {alert_type}"
-        body = f"""
-        <html>
-        <body>
-            <h2>Security Alert</h2>
-            <p>We detected {alert_type} on your account.</p>
-            <p><strong>Details:</strong> {details}</p>
-            <p>If this wasn't you, please contact our support team immediately.</p>
-            <p>Best regards,<br>Black Germ Security Team</p>
-        </body>
-        </html>
-        """
+        body = self._tpl["security_alert"].render(alert_type=alert_type, details=details)
         
         message = MessageSchema(
             subject=subject,
@@ -118,34 +160,17 @@ class EmailService:
             subtype="html"
         )
         
-        try:
-            await self.fastmail.send_message(message)
-            return True
-        except Exception as e:
-            print(f"Error sending security alert: {e}")
-            return False
+        return await self._enqueue(message, "Security alert")
     
     async def send_investment_insights(self, user_email: str, insights: dict):
         """Send AI-powered investment insights"""
         subject = "Your Weekly Investment Insights"
-        body = f"""
-        <html>
-        <body>
-            <h2>Weekly Investment Insights</h2>
-            <p>Here are your personalized investment insights:</p>
-            <ul>
-                <li><strong>Portfolio Value:</strong> ${insights.get('portfolio_value', 0):.2f}</li>
-                <li><strong>Growth Rate:</strong> {insights.get('growth_rate', 0):.1f}%</li>
-                <li><strong>Risk Level:</strong> {insights.get('risk_level', 'Moderate')}</li>
-            </ul>
-            <p><strong>Recommendations:</strong></p>
-            <ul>
-                {''.join([f'<li>{rec}</li>' for rec in insights.get('recommendations', [])])}
-            </ul>
-            <p>Best regards,<br>Black Germ AI Team</p>
-        </body>
-        </html>
-        """
+        body = self._tpl["investment_insights"].render(
+            portfolio_value=insights.get('portfolio_value', 0),
+            growth_rate=insights.get('growth_rate', 0),
+            risk_level=insights.get('risk_level', 'Moderate'),
+            recommendations=insights.get('recommendations', [])
+        )
         
         message = MessageSchema(
             subject=subject,
@@ -154,12 +179,7 @@ class EmailService:
             subtype="html"
         )
         
-        try:
-            await self.fastmail.send_message(message)
-            return True
-        except Exception as e:
-            print(f"Error sending insights email: {e}")
-            return False
+        return await self._enqueue(message, "Insights email")
 
 # Create a global instance
 email_service = EmailService()
\ No newline at end of file
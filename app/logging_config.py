@@ -1,7 +1,9 @@
 
+import atexit
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 def setup_logging():
     """Configure logging for the application"""
@@ -34,19 +36,25 @@ def setup_logging():
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(simple_formatter)
 
+    # Loggers only enqueue records; a background thread does the file and console I/O
+    log_queue = queue.Queue(-1)
+    queue_handler = QueueHandler(log_queue)
+    listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
     # Add handlers to logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    logger.addHandler(queue_handler)
 
     # Configure Uvicorn logger
     uvicorn_logger = logging.getLogger("uvicorn")
     uvicorn_logger.setLevel(logging.INFO)
-    uvicorn_logger.handlers = [file_handler, console_handler]
+    uvicorn_logger.handlers = [queue_handler]
 
     # Configure FastAPI logger
     fastapi_logger = logging.getLogger("fastapi")
     fastapi_logger.setLevel(logging.INFO)
-    fastapi_logger.handlers = [file_handler, console_handler]
+    fastapi_logger.handlers = [queue_handler]
 
 if __name__ == "__main__":
     setup_logging()
@@ -1,11 +1,21 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 import logging
+import os
 from fastapi import APIRouter, Depends, HTTPException, status
 from dotenv import load_dotenv
+from app.logging_config import setup_logging
+
+# Load environment variables and initialize logging before any app module reads them
+load_dotenv()
+setup_logging()
+
 from app.database import engine, get_db
 from app import models, schemas, auth
+from app.portfolio import get_user_totals
 from app.routers import users, transactions, ai_assistant
 from app.routers import crypto
 from app.routers import payments
@@ -13,37 +23,49 @@ from app.routers import notifications
 from app.routers import mobile_money
 from app.routers import admin
 from app.routers import web3_deposits
-from app.background_tasks import start_background_tasks
-from app.logging_config import setup_logging
+from app.background_tasks import start_background_tasks, stop_background_tasks
+from app.crypto_service import crypto_service
+from app.email_service import email_service
+from app.mobile_money_service import mobile_money_service
 
-# Load environment variables
-load_dotenv()
-
-# Initialize logging
-setup_logging()
 logger = logging.getLogger(__name__)
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+# Create database tables in development only; deployed schemas are managed by the migration scripts
+if os.getenv("AUTO_CREATE_TABLES") == "1":
+    models.Base.metadata.create_all(bind=engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("Starting background tasks")
+    monitor_task = start_background_tasks()
+    yield
+    await stop_background_tasks(monitor_task)
+    await email_service.shutdown()
+    await crypto_service.close()
+    await mobile_money_service.close()
 
 # Create FastAPI app
 app = FastAPI(
     title="Black Germ",
     description="A secure cryptocurrency investment platform with AI-powered insights",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # orjson encodes response bodies several times faster than the stdlib json module
+    default_response_class=ORJSONResponse
 )
 logger.info("Black Germ FastAPI application initialized")
 
 # Add CORS middleware
-import os
+# Credentialed requests need explicit origins; a wildcard is refused by browsers
+ALLOWED_ORIGINS = tuple(origin.strip() for origin in os.getenv("ALLOWED_ORIGINS", "").split(",") if origin.strip())
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # ✅ Allow all origins
+    allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_headers=["Authorization", "Content-Type"],
 )
-logger.info("CORS middleware configured")
+logger.info(f"CORS middleware configured for origins: {', '.join(ALLOWED_ORIGINS) or 'none'}")
 
 # Include routers
 app.include_router(users.router, prefix="/api/users", tags=["users"])
@@ -59,7 +81,7 @@ logger.info("API routers included")
 
 @app.get("/")
 async def root():
-    logger.info("Root endpoint accessed")
+    logger.debug("Root endpoint accessed")
     try:
         return {"message": "Welcome to Black Germ"}
     except Exception as e:
@@ -74,7 +96,7 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    logger.info("Health check endpoint accessed")
+    logger.debug("Health check endpoint accessed")
     try:
         return {"status": "healthy", "message": "Black Germ API is running"}
     except Exception as e:
@@ -87,23 +109,28 @@ async def health_check():
             }
         )
 
+DASHBOARD_RECENT_TRANSACTIONS = 50
+
 @app.get("/api/dashboard", response_model=schemas.DashboardData)
-async def get_dashboard(
+def get_dashboard(
     current_user: models.User = Depends(auth.get_current_active_user), 
     db: Session = Depends(get_db)
 ):
     """Get user dashboard data"""
-    logger.info(f"Fetching dashboard data for user {current_user.email}")
+    logger.debug(f"Fetching dashboard data for user {current_user.email}")
     try:
-        # Get user's transactions
-        transactions = db.query(models.Transaction).filter(models.Transaction.user_id == current_user.id).all()
+        # Get user's most recent transactions
+        transactions = db.query(models.Transaction).filter(
+            models.Transaction.user_id == current_user.id
+        ).order_by(models.Transaction.created_at.desc()).limit(DASHBOARD_RECENT_TRANSACTIONS).all()
         
-        # Calculate totals
-        total_deposits = sum(t.amount for t in transactions if t.type == "deposit" and t.status == "completed")
-        total_withdrawals = sum(t.amount for t in transactions if t.type == "withdraw" and t.status == "completed")
+        # Calculate totals in the database rather than over every historical row
+        totals = get_user_totals(db, current_user.id)
+        total_deposits = totals.get("deposit") or 0
+        total_withdrawals = totals.get("withdraw") or 0
         current_balance = current_user.balance
         
-        logger.info(f"Dashboard data retrieved for {current_user.email}: {len(transactions)} transactions")
+        logger.debug(f"Dashboard data retrieved for {current_user.email}: {len(transactions)} transactions")
         return schemas.DashboardData(
             user=current_user,
             transactions=transactions,
@@ -123,7 +150,5 @@ async def get_dashboard(
 
 if __name__ == "__main__":
     import uvicorn
-    logger.info("Starting background tasks")
-    start_background_tasks()
     logger.info("Starting Uvicorn server")
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,10 +1,10 @@
+import asyncio
 import httpx
 import json
-import hashlib
 import hmac
 import time
 from typing import Dict, Optional, Tuple
-from datetime import datetime
+from datetime import datetime, timezone
 import logging
 import sys
 import os
@@ -12,11 +12,17 @@ import os
 # Add the parent directory to the path to import the config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from mobile_money_config import MobileMoneyConfig
+from app.cache import cache
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Handlers and levels are configured once at startup by app.logging_config
 logger = logging.getLogger(__name__)
 
+# Pending transactions live in the shared cache so every worker sees them and they expire
+PENDING_TRANSACTION_TTL_SECONDS = 24 * 60 * 60
+
+# Upper bound on in-flight requests to each provider; callers beyond it wait here
+MAX_CONCURRENT_PROVIDER_REQUESTS = 50
+
 class MobileMoneyService:
     def __init__(self):
         # Load configuration
@@ -38,317 +44,191 @@ class MobileMoneyService:
         self.orange_merchant_id = orange_config["merchant_id"]
         self.orange_callback_url = orange_config["callback_url"]
         
-        # Transaction status tracking
-        self.pending_transactions = {}
+        # Request settings for each (provider, transaction type) handled by _initiate
+        self._providers = {
+            ("MTN", "deposit"): {
+                "url": f"{self.mtn_base_url}/collections",
+                "api_key": self.mtn_api_key,
+                "api_secret": self.mtn_api_secret,
+                "merchant_id": self.mtn_merchant_id,
+                "prefix": "MTN_DEP",
+                "description": "Deposit to BlackGerm account",
+                "callback_url": self.mtn_callback_url,
+                "label": "MTN Mobile Money"
+            },
+            ("Orange", "deposit"): {
+                "url": f"{self.orange_base_url}/collections",
+                "api_key": self.orange_api_key,
+                "api_secret": self.orange_api_secret,
+                "merchant_id": self.orange_merchant_id,
+                "prefix": "ORANGE_DEP",
+                "description": "Deposit to BlackGerm account",
+                "callback_url": self.orange_callback_url,
+                "label": "Orange Money"
+            },
+            ("MTN", "withdrawal"): {
+                "url": f"{self.mtn_base_url}/disbursements",
+                "api_key": self.mtn_api_key,
+                "api_secret": self.mtn_api_secret,
+                "merchant_id": self.mtn_merchant_id,
+                "prefix": "MTN_WIT",
+                "description": "Withdrawal from BlackGerm account",
+                "callback_url": "https://your-domain.com/api/mobile-money/mtn/withdrawal-callback",
+                "label": "MTN Mobile Money"
+            },
+            ("Orange", "withdrawal"): {
+                "url": f"{self.orange_base_url}/disbursements",
+                "api_key": self.orange_api_key,
+                "api_secret": self.orange_api_secret,
+                "merchant_id": self.orange_merchant_id,
+                "prefix": "ORANGE_WIT",
+                "description": "Withdrawal from BlackGerm account",
+                "callback_url": "https://your-domain.com/api/mobile-money/orange/withdrawal-callback",
+                "label": "Orange Money"
+            }
+        }
+        
+        # Pre-serialize the fixed part of each signed payload (see _canonical_payload),
+        # encode the signing secrets and build the constant headers once
+        for settings in self._providers.values():
+            settings["secret_bytes"] = settings["api_secret"].encode('utf-8')
+            settings["base_headers"] = {
+                "Authorization": f"Bearer {settings['api_key']}",
+                "Content-Type": "application/json"
+            }
+            settings["signing_fields"] = (
+                f', "callback_url": {json.dumps(settings["callback_url"])}'
+                f', "currency": "XAF"'
+                f', "description": {json.dumps(settings["description"])}'
+                f', "merchant_id": {json.dumps(settings["merchant_id"])}'
+            )
+        
+        # Shared client so provider calls reuse pooled (HTTP/2) connections
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphores = {
+            "MTN": asyncio.Semaphore(MAX_CONCURRENT_PROVIDER_REQUESTS),
+            "Orange": asyncio.Semaphore(MAX_CONCURRENT_PROVIDER_REQUESTS)
+        }
     
-    def _generate_mtn_signature(self, data: str, timestamp: str) -> str:
-        """Generate MTN API signature for authentication"""
-        message = f"{data}{timestamp}{self.mtn_api_secret}"
-        signature = hmac.new(
-            self.mtn_api_secret.encode('utf-8'),
-            message.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest()
-        return signature
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client, creating it on first use"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=30.0,
+                limits=httpx.Limits(max_keepalive_connections=100, max_connections=200),
+                http2=True,
+            )
+        return self._client
     
-    def _generate_orange_signature(self, data: str, timestamp: str) -> str:
-        """Generate Orange Money API signature for authentication"""
-        message = f"{data}{timestamp}{self.orange_api_secret}"
-        signature = hmac.new(
-            self.orange_api_secret.encode('utf-8'),
-            message.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest()
-        return signature
+    async def close(self):
+        """Close the shared HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
-    async def initiate_mtn_deposit(self, phone_number: str, amount: float, user_id: int) -> Dict:
-        """Initiate MTN Mobile Money deposit"""
+    def _generate_signature(self, secret: bytes, data: bytes, timestamp: str) -> str:
+        """Generate provider API signature for authentication"""
+        # HMAC over data + timestamp + secret via the one-shot digest, which runs entirely in OpenSSL
+        return hmac.digest(secret, data + timestamp.encode('utf-8') + secret, 'sha256').hex()
+    
+    def _pending_key(self, transaction_id: str) -> str:
+        return f"mm:txn:{transaction_id}"
+    
+    def _canonical_payload(self, settings: Dict, amount: float, phone_number: str, transaction_id: str) -> str:
+        """Build the signed request body.
+
+        Produces exactly json.dumps(payload, sort_keys=True): keys are written in sorted
+        order and only the per-request values are serialized on each call.
+        """
+        return (
+            f'{{"amount": {json.dumps(amount)}'
+            f'{settings["signing_fields"]}'
+            f', "phone_number": {json.dumps(phone_number)}'
+            f', "transaction_id": {json.dumps(transaction_id)}}}'
+        )
+    
+    async def _initiate(self, provider: str, transaction_type: str, phone_number: str, amount: float, user_id: int) -> Dict:
+        """Initiate a deposit or withdrawal with a mobile money provider"""
+        settings = self._providers[(provider, transaction_type)]
         try:
-            timestamp = str(int(time.time()))
-            transaction_id = f"MTN_DEP_{timestamp}_{user_id}"
+            now_ns = time.time_ns()
+            now = now_ns / 1_000_000_000
+            timestamp = str(now_ns // 1_000_000_000)
+            # Nanosecond ids so repeat initiations by one user within a second don't collide
+            transaction_id = f"{settings['prefix']}_{now_ns}_{user_id}"
             
-            payload = {
-                "merchant_id": self.mtn_merchant_id,
-                "amount": amount,
-                "currency": "XAF",
-                "phone_number": phone_number,
-                "transaction_id": transaction_id,
-                "description": f"Deposit to BlackGerm account",
-                "callback_url": "https://your-domain.com/api/mobile-money/mtn/callback"
-            }
+            data_bytes = self._canonical_payload(settings, amount, phone_number, transaction_id).encode('utf-8')
+            signature = self._generate_signature(settings["secret_bytes"], data_bytes, timestamp)
             
-            data_string = json.dumps(payload, sort_keys=True)
-            signature = self._generate_mtn_signature(data_string, timestamp)
+            headers = {**settings["base_headers"], "X-Signature": signature, "X-Timestamp": timestamp}
             
-            headers = {
-                "Authorization": f"Bearer {self.mtn_api_key}",
-                "X-Signature": signature,
-                "X-Timestamp": timestamp,
-                "Content-Type": "application/json"
-            }
+            client = self._get_client()
+            # The signed string is itself the JSON body, so it is serialized only once
+            async with self._semaphores[provider]:
+                response = await client.post(settings["url"], content=data_bytes, headers=headers)
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.mtn_base_url}/collections",
-                    json=payload,
-                    headers=headers,
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    self.pending_transactions[transaction_id] = {
-                        "provider": "MTN",
-                        "type": "deposit",
+            if response.status_code == 200:
+                result = {
+                    "success": True,
+                    "transaction_id": transaction_id,
+                    "status": "pending",
+                    "message": f"{settings['label']} {transaction_type} initiated successfully",
+                    "provider": provider,
+                    "amount": amount,
+                    "phone_number": phone_number
+                }
+                # The provider has accepted the request, so failing to track it must not
+                # turn into a failure (and, for withdrawals, a refund)
+                try:
+                    await cache.set_json_async(self._pending_key(transaction_id), {
+                        "provider": provider,
+                        "type": transaction_type,
                         "amount": amount,
                         "phone_number": phone_number,
                         "user_id": user_id,
                         "status": "pending",
-                        "created_at": datetime.utcnow()
-                    }
-                    
-                    return {
-                        "success": True,
-                        "transaction_id": transaction_id,
-                        "status": "pending",
-                        "message": "MTN Mobile Money deposit initiated successfully",
-                        "provider": "MTN",
-                        "amount": amount,
-                        "phone_number": phone_number
-                    }
-                else:
-                    logger.error(f"MTN API error: {response.status_code} - {response.text}")
-                    return {
-                        "success": False,
-                        "error": f"MTN API error: {response.status_code}",
-                        "message": "Failed to initiate MTN deposit"
-                    }
-                    
-        except Exception as e:
-            logger.error(f"MTN deposit error: {str(e)}")
+                        "created_at": now
+                    }, PENDING_TRANSACTION_TTL_SECONDS)
+                except Exception:
+                    logger.exception("Could not cache pending %s %s %s", provider, transaction_type, transaction_id)
+                return result
+            else:
+                logger.error("%s %s API error: %s - %s", provider, transaction_type, response.status_code, response.text)
+                return {
+                    "success": False,
+                    "error": f"{provider} API error: {response.status_code}",
+                    "message": f"Failed to initiate {provider} {transaction_type}"
+                }
+                
+        except httpx.HTTPError as e:
+            # Transport failures only (timeouts included); programming errors propagate
+            logger.error("%s %s error: %s", provider, transaction_type, e)
             return {
                 "success": False,
                 "error": str(e),
-                "message": "Failed to initiate MTN deposit"
+                "message": f"Failed to initiate {provider} {transaction_type}"
             }
     
+    async def initiate_mtn_deposit(self, phone_number: str, amount: float, user_id: int) -> Dict:
+        """Initiate MTN Mobile Money deposit"""
+        return await self._initiate("MTN", "deposit", phone_number, amount, user_id)
+    
     async def initiate_orange_deposit(self, phone_number: str, amount: float, user_id: int) -> Dict:
         """Initiate Orange Money deposit"""
-        try:
-            timestamp = str(int(time.time()))
-            transaction_id = f"ORANGE_DEP_{timestamp}_{user_id}"
-            
-            payload = {
-                "merchant_id": self.orange_merchant_id,
-                "amount": amount,
-                "currency": "XAF",
-                "phone_number": phone_number,
-                "transaction_id": transaction_id,
-                "description": f"Deposit to BlackGerm account",
-                "callback_url": "https://your-domain.com/api/mobile-money/orange/callback"
-            }
-            
-            data_string = json.dumps(payload, sort_keys=True)
-            signature = self._generate_orange_signature(data_string, timestamp)
-            
-            headers = {
-                "Authorization": f"Bearer {self.orange_api_key}",
-                "X-Signature": signature,
-                "X-Timestamp": timestamp,
-                "Content-Type": "application/json"
-            }
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.orange_base_url}/collections",
-                    json=payload,
-                    headers=headers,
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    self.pending_transactions[transaction_id] = {
-                        "provider": "Orange",
-                        "type": "deposit",
-                        "amount": amount,
-                        "phone_number": phone_number,
-                        "user_id": user_id,
-                        "status": "pending",
-                        "created_at": datetime.utcnow()
-                    }
-                    
-                    return {
-                        "success": True,
-                        "transaction_id": transaction_id,
-                        "status": "pending",
-                        "message": "Orange Money deposit initiated successfully",
-                        "provider": "Orange",
-                        "amount": amount,
-                        "phone_number": phone_number
-                    }
-                else:
-                    logger.error(f"Orange API error: {response.status_code} - {response.text}")
-                    return {
-                        "success": False,
-                        "error": f"Orange API error: {response.status_code}",
-                        "message": "Failed to initiate Orange deposit"
-                    }
-                    
-        except Exception as e:
-            logger.error(f"Orange deposit error: {str(e)}")
-            return {
-                "success": False,
-                "error": str(e),
-                "message": "Failed to initiate Orange deposit"
-            }
+        return await self._initiate("Orange", "deposit", phone_number, amount, user_id)
     
     async def initiate_mtn_withdrawal(self, phone_number: str, amount: float, user_id: int) -> Dict:
         """Initiate MTN Mobile Money withdrawal"""
-        try:
-            timestamp = str(int(time.time()))
-            transaction_id = f"MTN_WIT_{timestamp}_{user_id}"
-            
-            payload = {
-                "merchant_id": self.mtn_merchant_id,
-                "amount": amount,
-                "currency": "XAF",
-                "phone_number": phone_number,
-                "transaction_id": transaction_id,
-                "description": f"Withdrawal from BlackGerm account",
-                "callback_url": "https://your-domain.com/api/mobile-money/mtn/withdrawal-callback"
-            }
-            
-            data_string = json.dumps(payload, sort_keys=True)
-            signature = self._generate_mtn_signature(data_string, timestamp)
-            
-            headers = {
-                "Authorization": f"Bearer {self.mtn_api_key}",
-                "X-Signature": signature,
-                "X-Timestamp": timestamp,
-                "Content-Type": "application/json"
-            }
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.mtn_base_url}/disbursements",
-                    json=payload,
-                    headers=headers,
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    self.pending_transactions[transaction_id] = {
-                        "provider": "MTN",
-                        "type": "withdrawal",
-                        "amount": amount,
-                        "phone_number": phone_number,
-                        "user_id": user_id,
-                        "status": "pending",
-                        "created_at": datetime.utcnow()
-                    }
-                    
-                    return {
-                        "success": True,
-                        "transaction_id": transaction_id,
-                        "status": "pending",
-                        "message": "MTN Mobile Money withdrawal initiated successfully",
-                        "provider": "MTN",
-                        "amount": amount,
-                        "phone_number": phone_number
-                    }
-                else:
-                    logger.error(f"MTN withdrawal API error: {response.status_code} - {response.text}")
-                    return {
-                        "success": False,
-                        "error": f"MTN API error: {response.status_code}",
-                        "message": "Failed to initiate MTN withdrawal"
-                    }
-                    
-        except Exception as e:
-            logger.error(f"MTN withdrawal error: {str(e)}")
-            return {
-                "success": False,
-                "error": str(e),
-                "message": "Failed to initiate MTN withdrawal"
-            }
+        return await self._initiate("MTN", "withdrawal", phone_number, amount, user_id)
     
     async def initiate_orange_withdrawal(self, phone_number: str, amount: float, user_id: int) -> Dict:
         """Initiate Orange Money withdrawal"""
-        try:
-            timestamp = str(int(time.time()))
-            transaction_id = f"ORANGE_WIT_{timestamp}_{user_id}"
-            
-            payload = {
-                "merchant_id": self.orange_merchant_id,
-                "amount": amount,
-                "currency": "XAF",
-                "phone_number": phone_number,
-                "transaction_id": transaction_id,
-                "description": f"Withdrawal from BlackGerm account",
-                "callback_url": "https://your-domain.com/api/mobile-money/orange/withdrawal-callback"
-            }
-            
-            data_string = json.dumps(payload, sort_keys=True)
-            signature = self._generate_orange_signature(data_string, timestamp)
-            
-            headers = {
-                "Authorization": f"Bearer {self.orange_api_key}",
-                "X-Signature": signature,
-                "X-Timestamp": timestamp,
-                "Content-Type": "application/json"
-            }
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.orange_base_url}/disbursements",
-                    json=payload,
-                    headers=headers,
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    self.pending_transactions[transaction_id] = {
-                        "provider": "Orange",
-                        "type": "withdrawal",
-                        "amount": amount,
-                        "phone_number": phone_number,
-                        "user_id": user_id,
-                        "status": "pending",
-                        "created_at": datetime.utcnow()
-                    }
-                    
-                    return {
-                        "success": True,
-                        "transaction_id": transaction_id,
-                        "status": "pending",
-                        "message": "Orange Money withdrawal initiated successfully",
-                        "provider": "Orange",
-                        "amount": amount,
-                        "phone_number": phone_number
-                    }
-                else:
-                    logger.error(f"Orange withdrawal API error: {response.status_code} - {response.text}")
-                    return {
-                        "success": False,
-                        "error": f"Orange API error: {response.status_code}",
-                        "message": "Failed to initiate Orange withdrawal"
-                    }
-                    
-        except Exception as e:
-            logger.error(f"Orange withdrawal error: {str(e)}")
-            return {
-                "success": False,
-                "error": str(e),
-                "message": "Failed to initiate Orange withdrawal"
-            }
+        return await self._initiate("Orange", "withdrawal", phone_number, amount, user_id)
     
     async def check_transaction_status(self, transaction_id: str) -> Dict:
         """Check the status of a mobile money transaction"""
-        if transaction_id in self.pending_transactions:
-            transaction = self.pending_transactions[transaction_id]
+        transaction = await cache.get_json_async(self._pending_key(transaction_id))
+        if transaction is not None:
             return {
                 "success": True,
                 "transaction_id": transaction_id,
@@ -357,7 +237,8 @@ class MobileMoneyService:
                 "type": transaction["type"],
                 "amount": transaction["amount"],
                 "phone_number": transaction["phone_number"],
-                "created_at": transaction["created_at"].isoformat()
+                # Stored as epoch seconds; only formatted when read
+                "created_at": datetime.fromtimestamp(transaction["created_at"], tz=timezone.utc).isoformat()
             }
         else:
             return {
@@ -372,8 +253,11 @@ class MobileMoneyService:
             transaction_id = callback_data.get("transaction_id")
             status = callback_data.get("status")
             
-            if transaction_id in self.pending_transactions:
-                self.pending_transactions[transaction_id]["status"] = status
+            key = self._pending_key(transaction_id)
+            transaction = await cache.get_json_async(key)
+            if transaction is not None:
+                transaction["status"] = status
+                await cache.set_json_async(key, transaction, PENDING_TRANSACTION_TTL_SECONDS)
                 
                 return {
                     "success": True,
@@ -390,7 +274,7 @@ class MobileMoneyService:
                 }
                 
         except Exception as e:
-            logger.error(f"Callback processing error: {str(e)}")
+            logger.error("Callback processing error: %s", e)
             return {
                 "success": False,
                 "error": str(e),
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean
+import json
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, CheckConstraint, Index, PrimaryKeyConstraint, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -49,6 +50,27 @@ class Transaction(Base):
     # Relationship with deposit address
     deposit_address = relationship("Web3DepositAddress", back_populates="transactions")
 
+    __table_args__ = (
+        CheckConstraint("amount > 0", name="ck_transactions_amount_positive"),
+        # Covers the per-user completed totals on the dashboard
+        Index("idx_transactions_user_status_type", "user_id", "status", "type"),
+        # Per-user history listings, newest first
+        Index("idx_transactions_user_created_at", "user_id", "created_at"),
+        # Admin listings and date-range reports across all users
+        Index("idx_transactions_created_at", "created_at"),
+        # Per-user listings restricted to mobile money providers or web3 networks
+        Index("idx_transactions_user_provider", "user_id", "provider"),
+        # Mobile money status lookups by provider transaction ID
+        Index("idx_transactions_transaction_id", "transaction_id"),
+        # One row per payment intent / chain hash, so a retried confirmation can't credit twice
+        Index("uq_transactions_transaction_hash", "transaction_hash", unique=True),
+        # Partial indexes for the completed-revenue date ranges and the pending approval queue
+        Index("idx_transactions_completed_created_at", "created_at",
+              postgresql_where=text("status = 'completed'"), sqlite_where=text("status = 'completed'")),
+        Index("idx_transactions_pending_created_at", "created_at",
+              postgresql_where=text("status = 'pending'"), sqlite_where=text("status = 'pending'")),
+    )
+
 class Web3DepositAddress(Base):
     __tablename__ = "web3_deposit_addresses"
     
@@ -66,6 +88,11 @@ class Web3DepositAddress(Base):
     user = relationship("User", back_populates="deposit_addresses")
     transactions = relationship("Transaction", back_populates="deposit_address")
 
+    __table_args__ = (
+        # Pending-address scans in the deposit monitor and expiry sweep
+        Index("idx_web3_deposit_addresses_status_expires_at", "status", "expires_at"),
+    )
+
 class Admin(Base):
     __tablename__ = "admins"
 
@@ -79,6 +106,46 @@ class Admin(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # One row per granted permission; the JSON column is kept for API responses
+    permission_entries = relationship("AdminPermission", cascade="all, delete-orphan")
+
+    @property
+    def permissions_set(self) -> frozenset:
+        """Granted permission names, falling back to the JSON column for admins not yet migrated"""
+        if self.permission_entries:
+            return frozenset(entry.name for entry in self.permission_entries)
+        cached = getattr(self, "_permissions_cache", None)
+        if cached is None or cached[0] != self.permissions:
+            try:
+                names = frozenset(json.loads(self.permissions or "[]"))
+            except (ValueError, TypeError):
+                # A malformed legacy column grants nothing
+                names = frozenset()
+            cached = (self.permissions, names)
+            self._permissions_cache = cached
+        return cached[1]
+
+    def set_permissions(self, names):
+        """Store permissions in both the JSON column and the admin_permissions rows"""
+        names = list(dict.fromkeys(names or []))
+        self.permissions = json.dumps(names) if names else None
+        current = {entry.name: entry for entry in self.permission_entries}
+        for name in set(current) - set(names):
+            self.permission_entries.remove(current[name])
+        for name in names:
+            if name not in current:
+                self.permission_entries.append(AdminPermission(name=name))
+
+class AdminPermission(Base):
+    __tablename__ = "admin_permissions"
+
+    admin_id = Column(Integer, ForeignKey("admins.id", ondelete="CASCADE"), nullable=False)
+    name = Column(String, nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("admin_id", "name"),
+    )
+
 class SecurityAlert(Base):
     __tablename__ = "security_alerts"
 
@@ -88,11 +155,17 @@ class SecurityAlert(Base):
     message = Column(Text, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     ip_address = Column(String, nullable=True)
-    resolved = Column(String, default="false")
+    resolved = Column(Boolean, default=False, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     resolved_at = Column(DateTime(timezone=True), nullable=True)
     resolved_by = Column(Integer, ForeignKey("admins.id"), nullable=True)
 
+    __table_args__ = (
+        # Open alerts only, newest first; the predicate matches how each dialect renders ~resolved
+        Index("idx_security_alerts_open_created_at", "created_at",
+              postgresql_where=text("NOT resolved"), sqlite_where=text("resolved = 0")),
+    )
+
 class SystemLog(Base):
     __tablename__ = "system_logs"
 
@@ -1,20 +1,48 @@
 import stripe 
+import itertools
 import json
+import time
 from typing import Dict, Optional
-from datetime import datetime
+from datetime import datetime, timezone
 import os
 
 # Initialize Stripe (you'll need to set your API keys)
 stripe.api_key = "sk_test_your_stripe_test_key_here"  # Replace with your actual test key
 
+# Disambiguates withdrawal ids created within the same clock tick
+_withdrawal_counter = itertools.count()
+
+# Static configuration, built once rather than on every request
+PAYMENT_METHODS = {
+    "credit_card": {
+        "enabled": True,
+        "min_amount": 10.0,
+        "max_amount": 10000.0,
+        "processing_fee": 0.029  # 2.9%
+    },
+    "bank_transfer": {
+        "enabled": True,
+        "min_amount": 50.0,
+        "max_amount": 50000.0,
+        "processing_fee": 0.0
+    },
+    "crypto": {
+        "enabled": True,
+        "min_amount": 5.0,
+        "max_amount": 100000.0,
+        "processing_fee": 0.005  # 0.5%
+    }
+}
+
 class PaymentService:
     def __init__(self):
         self.currency = "usd"
     
-    def create_payment_intent(self, amount: float, user_email: str) -> Optional[Dict]:
+    async def create_payment_intent(self, amount: float, user_email: str) -> Optional[Dict]:
         """Create a payment intent for deposit"""
         try:
-            intent = stripe.PaymentIntent.create(
+            # The async Stripe API keeps the event loop free while Stripe is reached
+            intent = await stripe.PaymentIntent.create_async(
                 amount=int(amount * 100),  # Convert to cents
                 currency=self.currency,
                 metadata={
@@ -32,10 +60,10 @@ class PaymentService:
             print(f"Error creating payment intent: {e}")
             return None
     
-    def confirm_payment(self, payment_intent_id: str) -> Optional[Dict]:
+    async def confirm_payment(self, payment_intent_id: str) -> Optional[Dict]:
         """Confirm a payment and return status"""
         try:
-            intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+            intent = await stripe.PaymentIntent.retrieve_async(payment_intent_id)
             return {
                 "status": intent.status,
                 "amount": intent.amount / 100,  # Convert from cents
@@ -51,14 +79,14 @@ class PaymentService:
         try:
             # In a real implementation, you'd integrate with a crypto payment processor
             # For now, we'll simulate the withdrawal process
-            withdrawal_id = f"withdrawal_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
+            withdrawal_id = f"withdrawal_{time.time_ns()}_{next(_withdrawal_counter)}"
             
             return {
                 "withdrawal_id": withdrawal_id,
                 "amount": amount,
                 "wallet_address": wallet_address,
                 "status": "pending",
-                "estimated_completion": datetime.utcnow().isoformat(),
+                "estimated_completion": datetime.now(timezone.utc).isoformat(),
                 "network_fee": 0.001  # Simulated network fee
             }
         except Exception as e:
@@ -67,26 +95,7 @@ class PaymentService:
     
     def get_payment_methods(self) -> Dict:
         """Get available payment methods"""
-        return {
-            "credit_card": {
-                "enabled": True,
-                "min_amount": 10.0,
-                "max_amount": 10000.0,
-                "processing_fee": 0.029  # 2.9%
-            },
-            "bank_transfer": {
-                "enabled": True,
-                "min_amount": 50.0,
-                "max_amount": 50000.0,
-                "processing_fee": 0.0
-            },
-            "crypto": {
-                "enabled": True,
-                "min_amount": 5.0,
-                "max_amount": 100000.0,
-                "processing_fee": 0.005  # 0.5%
-            }
-        }
+        return PAYMENT_METHODS
 
 # Create a global instance
 payment_service = PaymentService()
\ No newline at end of file
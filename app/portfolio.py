@@ -0,0 +1,60 @@
+"""
+Cached per-user transaction reads.
+
+Totals of completed transactions (shared by the dashboard, AI and crypto endpoints) are
+cached in the shared cache; every path that writes a user's transactions calls
+invalidate_user_totals after committing so the next read recomputes them. Polled
+transaction statuses are cached too and dropped wherever a status can leave a final state.
+"""
+
+from typing import Dict, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app import models
+from app.cache import cache
+
+USER_TOTALS_CACHE_TTL_SECONDS = 60
+# Pending statuses change without notice (provider callbacks, the deposit monitor), so they
+# are only briefly cached; final ones only change through paths that invalidate them
+TRANSACTION_STATUS_CACHE_TTL_SECONDS = 30
+FINAL_TRANSACTION_STATUS_CACHE_TTL_SECONDS = 60 * 60
+FINAL_TRANSACTION_STATUSES = ("completed", "failed")
+
+def _totals_key(user_id: int) -> str:
+    return f"portfolio:{user_id}"
+
+def get_user_totals(db: Session, user_id: int) -> Dict[str, float]:
+    """Return the summed amount of the user's completed transactions per transaction type"""
+    key = _totals_key(user_id)
+    totals = cache.get_json(key)
+    if totals is None:
+        totals = dict(db.query(models.Transaction.type, func.sum(models.Transaction.amount)).filter(
+            models.Transaction.user_id == user_id,
+            models.Transaction.status == "completed"
+        ).group_by(models.Transaction.type).all())
+        cache.set_json(key, totals, USER_TOTALS_CACHE_TTL_SECONDS)
+    return totals
+
+def invalidate_user_totals(*user_ids: int):
+    """Drop cached totals for users whose transactions changed"""
+    cache.delete(*(_totals_key(user_id) for user_id in user_ids))
+
+def _status_key(user_id: int, transaction_id: int) -> str:
+    return f"tx:{user_id}:{transaction_id}"
+
+def get_cached_transaction_status(user_id: int, transaction_id: int) -> Optional[Dict]:
+    """Return the cached status payload for one of the user's transactions, if any"""
+    return cache.get_json(_status_key(user_id, transaction_id))
+
+def cache_transaction_status(user_id: int, transaction_id: int, payload: Dict):
+    """Cache a status payload, for longer once the transaction has settled"""
+    if payload["status"] in FINAL_TRANSACTION_STATUSES:
+        ttl = FINAL_TRANSACTION_STATUS_CACHE_TTL_SECONDS
+    else:
+        ttl = TRANSACTION_STATUS_CACHE_TTL_SECONDS
+    cache.set_json(_status_key(user_id, transaction_id), payload, ttl)
+
+def invalidate_transaction_status(user_id: int, transaction_id: int):
+    """Drop the cached status of a transaction that was changed or deleted"""
+    cache.delete(_status_key(user_id, transaction_id))
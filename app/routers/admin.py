@@ -1,59 +1,139 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_, text
+from sqlalchemy import case, exists, func, and_, or_, select, text, tuple_
+from sqlalchemy.exc import IntegrityError
 from typing import List, Optional
 from datetime import datetime, timedelta
+import csv
+import io
 import json
 import os
 from pydantic import BaseModel
 
-from app.database import get_db
+from app.database import SessionLocal, get_db
 from app import models, schemas
-from app.admin_auth import get_current_admin, get_current_super_admin, check_permission, get_password_hash, create_access_token, verify_password
+from app.admin_auth import get_current_admin, get_current_super_admin, check_permission
+from app.auth_core import get_password_hash
 from app.schemas import Token
+from app.cache import cache
+from app.portfolio import invalidate_user_totals, invalidate_transaction_status
 
 router = APIRouter()
 
 # Admin Authentication - Now handled by unified login endpoint
 # The /api/users/login endpoint now handles both users and admins
 
+# Platform fee used for the revenue estimates, read once at import
+TRANSACTION_FEE_PERCENTAGE = float(os.getenv("TRANSACTION_FEE_PERCENTAGE", "0.02"))  # 2% default
+
+# Aggregate admin reads are the same for every admin, so they are shared through the cache briefly
+ADMIN_STATS_CACHE_TTL_SECONDS = 60
+# Length in days of each analytics period accepted by the analytics endpoints
+ANALYTICS_PERIOD_DAYS = {"7d": 7, "30d": 30, "90d": 90, "1y": 365}
+ADMIN_STATS_CACHE_KEYS = (
+    "admin:dashboard:stats",
+    "admin:mobile-money:status",
+    *(f"admin:analytics:{name}:{period}" for name in ("revenue", "user-growth") for period in ANALYTICS_PERIOD_DAYS),
+)
+
+def _cache_admin_stats(key: str, value):
+    """Store a JSON-encoded copy of an aggregate response and return it"""
+    data = jsonable_encoder(value)
+    cache.set_json(key, data, ADMIN_STATS_CACHE_TTL_SECONDS)
+    return data
+
+def _period_range(period: str):
+    """Return (start_date, end_date) for an analytics period ending now"""
+    end_date = datetime.utcnow()
+    return end_date - timedelta(days=ANALYTICS_PERIOD_DAYS[period]), end_date
+
+def _invalidate_admin_stats():
+    """Drop cached aggregates after an admin changes users or transactions"""
+    cache.delete(*ADMIN_STATS_CACHE_KEYS)
+
+def _paginate(query, page: int, page_size: int):
+    """Return (rows, total_count) for one page, counting all matches in the same query with COUNT(*) OVER ()
+
+    Each row carries the count as an extra trailing column.
+    """
+    rows = query.add_columns(func.count().over().label("total_count")).offset((page - 1) * page_size).limit(page_size).all()
+    if rows:
+        return rows, rows[0].total_count
+    # Past the last page there is no row to carry the count
+    return rows, (query.order_by(None).count() if page > 1 else 0)
+
+def _paginate_newest_first(query, model, page: int, page_size: int,
+                           after_created_at: Optional[datetime], after_id: Optional[int]):
+    """Return (rows, total_count, next_cursor) ordered by (created_at, id) descending
+
+    When a cursor from the previous page is given the page starts right after it (keyset
+    pagination), so deep pages cost the same as the first; otherwise `page` is used.
+    """
+    ordered = query.order_by(model.created_at.desc(), model.id.desc())
+    if after_created_at is not None and after_id is not None:
+        rows, _ = _paginate(ordered.filter(tuple_(model.created_at, model.id) < (after_created_at, after_id)), 1, page_size)
+        total_count = query.count()
+    else:
+        rows, total_count = _paginate(ordered, page, page_size)
+    next_cursor = None
+    if len(rows) == page_size:
+        last = rows[-1][0]
+        next_cursor = {"after_created_at": last.created_at, "after_id": last.id}
+    return rows, total_count, next_cursor
+
+def _user_transaction_stats(db: Session, user_ids: List[int]) -> dict:
+    """Return {user_id: (transaction_count, total_deposits, total_withdrawals)} in one grouped query"""
+    T = models.Transaction
+    rows = db.query(
+        T.user_id,
+        func.count(T.id),
+        func.coalesce(func.sum(case((and_(T.type == "deposit", T.status == "completed"), T.amount), else_=0)), 0),
+        func.coalesce(func.sum(case((and_(T.type == "withdraw", T.status == "completed"), T.amount), else_=0)), 0)
+    ).filter(T.user_id.in_(user_ids)).group_by(T.user_id).all()
+    return {user_id: (count, deposits, withdrawals) for user_id, count, deposits, withdrawals in rows}
+
 # Dashboard Statistics
 @router.get("/dashboard/stats", response_model=schemas.AdminDashboardStats)
-async def get_dashboard_stats(
+def get_dashboard_stats(
     current_admin: models.Admin = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
-    # Get total users
-    total_users = db.query(models.User).count()
-    
-    # Get total balance
-    total_balance = db.query(func.sum(models.User.balance)).scalar() or 0
-    
-    # Get today's transactions
-    today = datetime.utcnow().date()
-    today_transactions = db.query(models.Transaction).filter(
-        func.date(models.Transaction.created_at) == today
-    ).count()
-    
-    # Get pending approvals
-    pending_approvals = db.query(models.Transaction).filter(
+    cached = cache.get_json("admin:dashboard:stats")
+    if cached is not None:
+        return cached
+    
+    # User totals in a single pass over users
+    total_users, total_balance, active_investments = db.query(
+        func.count(models.User.id),
+        func.coalesce(func.sum(models.User.balance), 0),
+        # Active investments are users with balance > 0
+        func.count(case((models.User.balance > 0, 1)))
+    ).one()
+    
+    # Today's transactions as a half-open created_at range so the created_at index applies
+    today_start = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    today_transactions = db.query(func.count(models.Transaction.id)).filter(
+        models.Transaction.created_at >= today_start,
+        models.Transaction.created_at < today_start + timedelta(days=1)
+    ).scalar()
+    
+    # Get pending approvals (served by the partial pending index)
+    pending_approvals = db.query(func.count(models.Transaction.id)).filter(
         models.Transaction.status == "pending"
-    ).count()
-    
-    # Get active investments (users with balance > 0)
-    active_investments = db.query(models.User).filter(models.User.balance > 0).count()
+    ).scalar()
     
     # Calculate revenue (transaction fees)
     # This is a simplified calculation - you might want to track actual fees
-    transaction_fee_percentage = float(os.getenv("TRANSACTION_FEE_PERCENTAGE", "0.02"))  # 2% default
-    platform_revenue = total_balance * transaction_fee_percentage
+    platform_revenue = total_balance * TRANSACTION_FEE_PERCENTAGE
     
     # Calculate daily, weekly, monthly revenue
     daily_revenue = platform_revenue / 30  # Simplified
     weekly_revenue = platform_revenue / 4
     monthly_revenue = platform_revenue
     
-    return schemas.AdminDashboardStats(
+    return _cache_admin_stats("admin:dashboard:stats", schemas.AdminDashboardStats(
         total_users=total_users,
         total_balance=total_balance,
         today_transactions=today_transactions,
@@ -63,11 +143,11 @@ async def get_dashboard_stats(
         daily_revenue=daily_revenue,
         weekly_revenue=weekly_revenue,
         monthly_revenue=monthly_revenue
-    )
+    ))
 
 # User Management
 @router.get("/users", response_model=schemas.AdminUserList)
-async def get_users(
+def get_users(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     search: Optional[str] = None,
@@ -75,7 +155,11 @@ async def get_users(
     current_admin: models.Admin = Depends(check_permission("user_management")),
     db: Session = Depends(get_db)
 ):
-    query = db.query(models.User)
+    # Only the columns the response uses, as plain rows
+    query = db.query(
+        models.User.id, models.User.email, models.User.balance, models.User.wallet_address,
+        models.User.created_at, models.User.updated_at, models.User.status
+    )
     
     if search:
         query = query.filter(
@@ -91,16 +175,13 @@ async def get_users(
             raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
         query = query.filter(models.User.status == status_filter)
     
-    total_count = query.count()
-    users = query.offset((page - 1) * page_size).limit(page_size).all()
+    users, total_count = _paginate(query, page, page_size)
     
-    # Convert to AdminUser format with simplified statistics
+    # Convert to AdminUser format with statistics for the whole page fetched at once
+    stats = _user_transaction_stats(db, [user.id for user in users]) if users else {}
     admin_users = []
     for user in users:
-        # Get user statistics (simplified approach)
-        transactions = db.query(models.Transaction).filter(models.Transaction.user_id == user.id).all()
-        total_deposits = sum(t.amount for t in transactions if t.type == "deposit" and t.status == "completed")
-        total_withdrawals = sum(t.amount for t in transactions if t.type == "withdraw" and t.status == "completed")
+        transaction_count, total_deposits, total_withdrawals = stats.get(user.id, (0, 0, 0))
         
         admin_users.append(schemas.AdminUser(
             id=user.id,
@@ -109,7 +190,7 @@ async def get_users(
             wallet_address=user.wallet_address,
             created_at=user.created_at,
             updated_at=user.updated_at,
-            transaction_count=len(transactions),
+            transaction_count=transaction_count,
             total_deposits=total_deposits,
             total_withdrawals=total_withdrawals,
             status=user.status
@@ -123,7 +204,7 @@ async def get_users(
     )
 
 @router.get("/users/{user_id}", response_model=schemas.AdminUser)
-async def get_user(
+def get_user(
     user_id: int,
     current_admin: models.Admin = Depends(check_permission("user_management")),
     db: Session = Depends(get_db)
@@ -132,11 +213,8 @@ async def get_user(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Get user statistics (simplified approach)
-    transactions = db.query(models.Transaction).filter(models.Transaction.user_id == user.id).all()
-    total_deposits = sum(t.amount for t in transactions if t.type == "deposit" and t.status == "completed")
-    total_withdrawals = sum(t.amount for t in transactions if t.type == "withdraw" and t.status == "completed")
-    transaction_count = len(transactions)
+    # Get user statistics
+    transaction_count, total_deposits, total_withdrawals = _user_transaction_stats(db, [user.id]).get(user.id, (0, 0, 0))
     
     return schemas.AdminUser(
         id=user.id,
@@ -152,7 +230,7 @@ async def get_user(
     )
 
 @router.put("/users/{user_id}")
-async def update_user(
+def update_user(
     user_id: int,
     user_update: schemas.AdminUserUpdate,
     current_admin: models.Admin = Depends(check_permission("user_management")),
@@ -178,6 +256,7 @@ async def update_user(
             db.add(log)
         
         db.commit()
+        _invalidate_admin_stats()
         return {"message": "User updated successfully"}
     except Exception as e:
         db.rollback()
@@ -185,12 +264,14 @@ async def update_user(
 
 # Transaction Management
 @router.get("/transactions", response_model=schemas.AdminTransactionList)
-async def get_transactions(
+def get_transactions(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     type_filter: Optional[str] = None,
     status_filter: Optional[str] = None,
     user_id: Optional[int] = None,
+    after_created_at: Optional[datetime] = None,
+    after_id: Optional[int] = None,
     current_admin: models.Admin = Depends(check_permission("transaction_management")),
     db: Session = Depends(get_db)
 ):
@@ -211,21 +292,18 @@ async def get_transactions(
     if user_id:
         query = query.filter(models.Transaction.user_id == user_id)
     
-    total_count = query.count()
-    transactions = query.order_by(models.Transaction.created_at.desc()).offset((page - 1) * page_size).limit(page_size).all()
-    
-    # Get user emails efficiently
-    user_ids = [t.user_id for t in transactions]
-    users = db.query(models.User.id, models.User.email).filter(models.User.id.in_(user_ids)).all()
-    user_emails = {user.id: user.email for user in users}
+    # Fetch each transaction's user email in the same query instead of a follow-up IN lookup
+    rows, total_count, next_cursor = _paginate_newest_first(query.add_columns(models.User.email).outerjoin(
+        models.User, models.User.id == models.Transaction.user_id
+    ), models.Transaction, page, page_size, after_created_at, after_id)
     
     # Convert to AdminTransaction format
     admin_transactions = []
-    for transaction in transactions:
+    for transaction, user_email, _ in rows:
         admin_transactions.append(schemas.AdminTransaction(
             id=transaction.id,
             user_id=transaction.user_id,
-            user_email=user_emails.get(transaction.user_id, "Unknown"),
+            user_email=user_email or "Unknown",
             type=transaction.type,
             amount=transaction.amount,
             currency=transaction.currency,
@@ -245,11 +323,12 @@ async def get_transactions(
         transactions=admin_transactions,
         total_count=total_count,
         page=page,
-        page_size=page_size
+        page_size=page_size,
+        next_cursor=next_cursor
     )
 
 @router.put("/transactions/{transaction_id}")
-async def update_transaction(
+def update_transaction(
     transaction_id: int,
     transaction_update: schemas.AdminTransactionUpdate,
     current_admin: models.Admin = Depends(check_permission("transaction_management")),
@@ -278,7 +357,11 @@ async def update_transaction(
         )
         db.add(log)
         
+        user_id = transaction.user_id
         db.commit()
+        _invalidate_admin_stats()
+        invalidate_user_totals(user_id)
+        invalidate_transaction_status(user_id, transaction_id)
         return {"message": "Transaction updated successfully"}
     except Exception as e:
         db.rollback()
@@ -286,7 +369,7 @@ async def update_transaction(
 
 # System Health
 @router.get("/system/health", response_model=schemas.AdminSystemHealth)
-async def get_system_health(
+def get_system_health(
     current_admin: models.Admin = Depends(check_permission("system_monitoring")),
     db: Session = Depends(get_db)
 ):
@@ -308,12 +391,15 @@ async def get_system_health(
 
 # Security Alerts
 @router.get("/security/alerts", response_model=List[schemas.AdminSecurityAlert])
-async def get_security_alerts(
+def get_security_alerts(
     current_admin: models.Admin = Depends(check_permission("security_monitoring")),
     db: Session = Depends(get_db)
 ):
-    alerts = db.query(models.SecurityAlert).filter(
-        models.SecurityAlert.resolved == "false"
+    # Resolve each alert's user email in the same query
+    alerts = db.query(models.SecurityAlert, models.User.email).outerjoin(
+        models.User, models.User.id == models.SecurityAlert.user_id
+    ).filter(
+        ~models.SecurityAlert.resolved
     ).order_by(models.SecurityAlert.created_at.desc()).all()
     
     return [
@@ -323,15 +409,15 @@ async def get_security_alerts(
             severity=alert.severity,
             message=alert.message,
             user_id=alert.user_id,
-            user_email=None,  # You'd need to join with User table
+            user_email=user_email,
             created_at=alert.created_at,
-            resolved=alert.resolved == "true"
+            resolved=alert.resolved
         )
-        for alert in alerts
+        for alert, user_email in alerts
     ]
 
 @router.put("/security/alerts/{alert_id}/resolve")
-async def resolve_security_alert(
+def resolve_security_alert(
     alert_id: int,
     current_admin: models.Admin = Depends(check_permission("security_monitoring")),
     db: Session = Depends(get_db)
@@ -341,7 +427,7 @@ async def resolve_security_alert(
         raise HTTPException(status_code=404, detail="Alert not found")
     
     try:
-        alert.resolved = "true"
+        alert.resolved = True
         alert.resolved_at = datetime.utcnow()
         alert.resolved_by = current_admin.id
         
@@ -353,7 +439,7 @@ async def resolve_security_alert(
 
 # Notifications
 @router.post("/notifications")
-async def create_notification(
+def create_notification(
     notification: schemas.AdminNotification,
     current_admin: models.Admin = Depends(check_permission("notifications")),
     db: Session = Depends(get_db)
@@ -378,7 +464,7 @@ async def create_notification(
 
 # Reports
 @router.post("/reports/generate")
-async def generate_report(
+def generate_report(
     report: schemas.AdminReport,
     current_admin: models.Admin = Depends(check_permission("reports")),
     db: Session = Depends(get_db)
@@ -406,7 +492,7 @@ async def generate_report(
 
 # Admin Management (Super Admin only)
 @router.post("/admins")
-async def create_admin(
+def create_admin(
     email: str,
     password: str,
     role: str = "admin",
@@ -414,9 +500,8 @@ async def create_admin(
     current_admin: models.Admin = Depends(get_current_super_admin),
     db: Session = Depends(get_db)
 ):
-    # Check if admin already exists
-    existing_admin = db.query(models.Admin).filter(models.Admin.email == email).first()
-    if existing_admin:
+    # Check if admin already exists without loading the row
+    if db.query(exists().where(models.Admin.email == email)).scalar():
         raise HTTPException(status_code=400, detail="Admin already exists")
     
     hashed_password = get_password_hash(password)
@@ -424,143 +509,128 @@ async def create_admin(
     new_admin = models.Admin(
         email=email,
         hashed_password=hashed_password,
-        role=role,
-        permissions=json.dumps(permissions) if permissions else None
+        role=role
     )
+    new_admin.set_permissions(permissions)
     
     try:
         db.add(new_admin)
         db.commit()
         
         return {"message": "Admin created successfully", "id": new_admin.id}
+    except IntegrityError:
+        # The unique email constraint caught a concurrent create that passed the check above
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Admin already exists")
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail="Database error occurred") 
 
 # Analytics and Reports
 @router.get("/analytics/revenue")
-async def get_revenue_analytics(
+def get_revenue_analytics(
     period: str = Query("30d", regex="^(7d|30d|90d|1y)$"),
     current_admin: models.Admin = Depends(check_permission("reports")),
     db: Session = Depends(get_db)
 ):
     """Get revenue analytics for different periods"""
-    end_date = datetime.utcnow()
-    
-    if period == "7d":
-        start_date = end_date - timedelta(days=7)
-    elif period == "30d":
-        start_date = end_date - timedelta(days=30)
-    elif period == "90d":
-        start_date = end_date - timedelta(days=90)
-    else:  # 1y
-        start_date = end_date - timedelta(days=365)
-    
-    # Get transactions in the period
-    transactions = db.query(models.Transaction).filter(
-        models.Transaction.created_at >= start_date,
-        models.Transaction.created_at <= end_date,
-        models.Transaction.status == "completed"
-    ).all()
-    
-    # Calculate revenue by type
-    deposits = [t for t in transactions if t.type == "deposit"]
-    withdrawals = [t for t in transactions if t.type == "withdraw"]
-    
-    total_deposits = sum(t.amount for t in deposits)
-    total_withdrawals = sum(t.amount for t in withdrawals)
+    cache_key = f"admin:analytics:revenue:{period}"
+    cached = cache.get_json(cache_key)
+    if cached is not None:
+        return cached
+    
+    start_date, end_date = _period_range(period)
+    
+    # Totals and counts by type for completed transactions in the period, in one aggregate row
+    T = models.Transaction
+    total_deposits, total_withdrawals, deposit_count, withdrawal_count, transaction_count = db.query(
+        func.coalesce(func.sum(case((T.type == "deposit", T.amount), else_=0)), 0),
+        func.coalesce(func.sum(case((T.type == "withdraw", T.amount), else_=0)), 0),
+        func.count(case((T.type == "deposit", 1))),
+        func.count(case((T.type == "withdraw", 1))),
+        func.count(T.id)
+    ).filter(
+        T.created_at >= start_date,
+        T.created_at <= end_date,
+        T.status == "completed"
+    ).one()
     
     # Calculate fees (simplified - you might want to track actual fees)
-    transaction_fee_percentage = float(os.getenv("TRANSACTION_FEE_PERCENTAGE", "0.02"))  # 2% default
-    revenue = total_deposits * transaction_fee_percentage
+    revenue = total_deposits * TRANSACTION_FEE_PERCENTAGE
     
-    return {
+    return _cache_admin_stats(cache_key, {
         "period": period,
         "total_deposits": total_deposits,
         "total_withdrawals": total_withdrawals,
         "revenue": revenue,
-        "transaction_count": len(transactions),
-        "deposit_count": len(deposits),
-        "withdrawal_count": len(withdrawals)
-    }
+        "transaction_count": transaction_count,
+        "deposit_count": deposit_count,
+        "withdrawal_count": withdrawal_count
+    })
 
 @router.get("/analytics/user-growth")
-async def get_user_growth_analytics(
+def get_user_growth_analytics(
     period: str = Query("30d", regex="^(7d|30d|90d|1y)$"),
     current_admin: models.Admin = Depends(check_permission("reports")),
     db: Session = Depends(get_db)
 ):
     """Get user growth analytics"""
-    end_date = datetime.utcnow()
+    cache_key = f"admin:analytics:user-growth:{period}"
+    cached = cache.get_json(cache_key)
+    if cached is not None:
+        return cached
     
-    if period == "7d":
-        start_date = end_date - timedelta(days=7)
-    elif period == "30d":
-        start_date = end_date - timedelta(days=30)
-    elif period == "90d":
-        start_date = end_date - timedelta(days=90)
-    else:  # 1y
-        start_date = end_date - timedelta(days=365)
-    
-    # Get new users in the period
-    new_users = db.query(models.User).filter(
-        models.User.created_at >= start_date,
-        models.User.created_at <= end_date
-    ).count()
-    
-    # Get total users before the period
-    total_before = db.query(models.User).filter(
-        models.User.created_at < start_date
-    ).count()
-    
-    # Get total users now
-    total_now = db.query(models.User).count()
+    start_date, end_date = _period_range(period)
+    
+    # New users in the period, users before it and the current total in one pass
+    new_users, total_before, total_now = db.query(
+        func.count(case((and_(models.User.created_at >= start_date, models.User.created_at <= end_date), 1))),
+        func.count(case((models.User.created_at < start_date, 1))),
+        func.count(models.User.id)
+    ).one()
     
     growth_rate = ((total_now - total_before) / total_before * 100) if total_before > 0 else 0
     
-    return {
+    return _cache_admin_stats(cache_key, {
         "period": period,
         "new_users": new_users,
         "total_users": total_now,
         "growth_rate": round(growth_rate, 2),
         "start_date": start_date,
         "end_date": end_date
-    }
+    })
 
 # Mobile Money Management
 @router.get("/mobile-money/status")
-async def get_mobile_money_status(
+def get_mobile_money_status(
     current_admin: models.Admin = Depends(check_permission("system_monitoring")),
     db: Session = Depends(get_db)
 ):
     """Get mobile money integration status"""
+    cached = cache.get_json("admin:mobile-money:status")
+    if cached is not None:
+        return cached
+    
     # Get recent mobile money transactions
-    recent_transactions = db.query(models.Transaction).filter(
+    recent_transactions = db.query(
+        models.Transaction.id, models.Transaction.type, models.Transaction.amount, models.Transaction.status,
+        models.Transaction.provider, models.Transaction.phone_number, models.Transaction.created_at
+    ).filter(
         models.Transaction.provider.isnot(None)
     ).order_by(models.Transaction.created_at.desc()).limit(10).all()
     
-    # Calculate success rates
-    total_mobile = db.query(models.Transaction).filter(
-        models.Transaction.provider.isnot(None)
-    ).count()
-    
-    successful_mobile = db.query(models.Transaction).filter(
-        models.Transaction.provider.isnot(None),
-        models.Transaction.status == "completed"
-    ).count()
+    # Success counts and provider breakdown in one pass
+    T = models.Transaction
+    total_mobile, successful_mobile, mtn_transactions, orange_transactions = db.query(
+        func.count(case((T.provider.isnot(None), 1))),
+        func.count(case((and_(T.provider.isnot(None), T.status == "completed"), 1))),
+        func.count(case((T.provider == "MTN Mobile Money", 1))),
+        func.count(case((T.provider == "Orange Money", 1)))
+    ).one()
     
     success_rate = (successful_mobile / total_mobile * 100) if total_mobile > 0 else 0
     
-    # Get provider breakdown
-    mtn_transactions = db.query(models.Transaction).filter(
-        models.Transaction.provider == "MTN Mobile Money"
-    ).count()
-    
-    orange_transactions = db.query(models.Transaction).filter(
-        models.Transaction.provider == "Orange Money"
-    ).count()
-    
-    return {
+    return _cache_admin_stats("admin:mobile-money:status", {
         "total_mobile_transactions": total_mobile,
         "successful_transactions": successful_mobile,
         "success_rate": round(success_rate, 2),
@@ -578,11 +648,11 @@ async def get_mobile_money_status(
             }
             for t in recent_transactions
         ]
-    }
+    })
 
 # AI Assistant Monitoring
 @router.get("/ai/analytics")
-async def get_ai_analytics(
+def get_ai_analytics(
     current_admin: models.Admin = Depends(check_permission("system_monitoring")),
     db: Session = Depends(get_db)
 ):
@@ -610,10 +680,12 @@ async def get_ai_analytics(
 
 # System Logs
 @router.get("/system/logs")
-async def get_system_logs(
+def get_system_logs(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     log_type: Optional[str] = None,
+    after_created_at: Optional[datetime] = None,
+    after_id: Optional[int] = None,
     current_admin: models.Admin = Depends(check_permission("system_monitoring")),
     db: Session = Depends(get_db)
 ):
@@ -623,8 +695,8 @@ async def get_system_logs(
     if log_type:
         query = query.filter(models.SystemLog.log_type == log_type)
     
-    total_count = query.count()
-    logs = query.order_by(models.SystemLog.created_at.desc()).offset((page - 1) * page_size).limit(page_size).all()
+    rows, total_count, next_cursor = _paginate_newest_first(query, models.SystemLog, page, page_size, after_created_at, after_id)
+    logs = [row[0] for row in rows]
     
     return {
         "logs": [
@@ -642,72 +714,94 @@ async def get_system_logs(
         ],
         "total_count": total_count,
         "page": page,
-        "page_size": page_size
+        "page_size": page_size,
+        "next_cursor": next_cursor
     }
 
 # Bulk Operations
+BULK_ACTION_STATUSES = {
+    "suspend": "suspended",
+    "activate": "active",
+    "delete": "inactive"  # Soft delete
+}
+BULK_ACTION_CHUNK_SIZE = 1000
+
 @router.post("/users/bulk-action")
-async def bulk_user_action(
+def bulk_user_action(
     user_ids: List[int],
     action: str,  # "suspend", "activate", "delete"
     current_admin: models.Admin = Depends(check_permission("user_management")),
     db: Session = Depends(get_db)
 ):
     """Perform bulk actions on users"""
-    if action not in ["suspend", "activate", "delete"]:
+    if action not in BULK_ACTION_STATUSES:
         raise HTTPException(status_code=400, detail="Invalid action")
     
-    users = db.query(models.User).filter(models.User.id.in_(user_ids)).all()
-    
-    for user in users:
-        if action == "suspend":
-            user.status = "suspended"
-        elif action == "activate":
-            user.status = "active"
-        elif action == "delete":
-            user.status = "inactive"  # Soft delete
-    
     try:
+        # Update statuses in the database without loading the users, in bounded IN lists
+        affected = 0
+        for start in range(0, len(user_ids), BULK_ACTION_CHUNK_SIZE):
+            affected += db.query(models.User).filter(
+                models.User.id.in_(user_ids[start:start + BULK_ACTION_CHUNK_SIZE])
+            ).update({models.User.status: BULK_ACTION_STATUSES[action]}, synchronize_session=False)
+        
         # Log the bulk action
         log = models.SystemLog(
             log_type="info",
-            message=f"Admin {current_admin.email} performed bulk action '{action}' on {len(users)} users",
+            message=f"Admin {current_admin.email} performed bulk action '{action}' on {affected} users",
             details=json.dumps({"action": action, "user_ids": user_ids}),
             admin_id=current_admin.id
         )
         db.add(log)
         
         db.commit()
+        _invalidate_admin_stats()
         
-        return {"message": f"Bulk action '{action}' completed on {len(users)} users"}
+        return {"message": f"Bulk action '{action}' completed on {affected} users"}
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail="Database error occurred")
 
 # Export Data
+EXPORT_BATCH_SIZE = 1000
+EXPORT_USER_COLUMNS = ("id", "email", "balance", "wallet_address", "created_at", "updated_at")
+
+def _stream_users_csv():
+    """Yield the users table as CSV, fetching and encoding EXPORT_BATCH_SIZE rows at a time"""
+    # The request's session is closed once the handler returns, so the stream owns its own
+    db = SessionLocal()
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_USER_COLUMNS)
+        rows = db.execute(
+            select(*(getattr(models.User, column) for column in EXPORT_USER_COLUMNS))
+            .order_by(models.User.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        for partition in rows.partitions():
+            writer.writerows(partition)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        db.close()
+
 @router.get("/export/users")
-async def export_users(
+def export_users(
     format: str = Query("json", regex="^(json|csv)$"),
     current_admin: models.Admin = Depends(check_permission("reports")),
     db: Session = Depends(get_db)
 ):
     """Export user data"""
-    users = db.query(models.User).all()
-    
-    if format == "json":
-        return {
-            "users": [
-                {
-                    "id": user.id,
-                    "email": user.email,
-                    "balance": user.balance,
-                    "wallet_address": user.wallet_address,
-                    "created_at": user.created_at,
-                    "updated_at": user.updated_at
-                }
-                for user in users
-            ]
-        }
-    else:  # csv
-        # You would implement CSV export here
-        return {"message": "CSV export not implemented yet"}
\ No newline at end of file
+    if format == "csv":
+        return StreamingResponse(
+            _stream_users_csv(),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=users.csv"}
+        )
+    
+    users = db.query(*(getattr(models.User, column) for column in EXPORT_USER_COLUMNS)).all()
+    return {"users": [user._asdict() for user in users]}
@@ -1,35 +1,81 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import json
-from datetime import datetime, timedelta
+import re
 
 from app.database import get_db
 from app import models, schemas, auth
+from app.portfolio import get_user_totals
 
 router = APIRouter()
 
+# Chat topics in priority order, matched by one case-insensitive pass over the message
+CHAT_TOPICS = ("risk", "growth", "market")
+CHAT_TOPIC_PATTERN = re.compile(
+    r"(?P<risk>risk|safety)|(?P<growth>growth|profit)|(?P<market>market|trend)",
+    re.IGNORECASE
+)
+
+def _chat_topic(message: str) -> Optional[str]:
+    """Return the highest-priority topic mentioned in message, if any"""
+    found = {match.lastgroup for match in CHAT_TOPIC_PATTERN.finditer(message)}
+    return next((topic for topic in CHAT_TOPICS if topic in found), None)
+
+def _json_body(payload: schemas.AIResponse) -> bytes:
+    return payload.model_dump_json().encode("utf-8")
+
+# Replies that don't depend on the user are validated and serialized once, at import
+STATIC_CHAT_BODIES = {
+    "market": _json_body(schemas.AIResponse(
+        response="Current market analysis suggests cryptocurrency volatility. Consider dollar-cost averaging for stable growth.",
+        analysis="Market trend analysis completed with volatility considerations.",
+        recommendations=[
+            "Implement dollar-cost averaging strategy",
+            "Diversify across multiple cryptocurrencies",
+            "Set up price alerts for major movements"
+        ]
+    )),
+    None: _json_body(schemas.AIResponse(
+        response="I can help with risk assessment, growth analysis, market trends, and investment strategies. What specific area would you like to explore?",
+        analysis="General inquiry - providing guidance on available AI features.",
+        recommendations=[
+            "Ask about risk assessment",
+            "Request growth analysis",
+            "Get market trend insights"
+        ]
+    ))
+}
+
+MARKET_PREDICTION_BODY = _json_body(schemas.AIResponse(
+    response="Market Prediction: Based on current trends, expect 15-25% volatility in the next 30 days. Bitcoin showing bullish signals.",
+    analysis="AI analysis indicates favorable market conditions for strategic investments.",
+    recommendations=[
+        "Consider increasing position sizes gradually",
+        "Set stop-loss orders at 10% below current prices",
+        "Diversify into emerging altcoins",
+        "Monitor regulatory news for market impact"
+    ]
+))
+
 @router.post("/chat", response_model=schemas.AIResponse)
-async def chat_with_ai(
+def chat_with_ai(
     request: schemas.AIRequest,
     current_user: models.User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Enhanced AI chat with investment analysis"""
-    # Get user's transaction history
-    user_transactions = db.query(models.Transaction).filter(
-        models.Transaction.user_id == current_user.id
-    ).all()
-    
-    # Calculate advanced metrics
-    total_deposits = sum(t.amount for t in user_transactions if t.type == "deposit" and t.status == "completed")
-    total_withdrawals = sum(t.amount for t in user_transactions if t.type == "withdraw" and t.status == "completed")
-    recent_transactions = [t for t in user_transactions if t.timestamp > datetime.utcnow() - timedelta(days=30)]
-    
     # Advanced AI analysis based on user message
-    message_lower = request.message.lower()
+    topic = _chat_topic(request.message)
+    if topic in STATIC_CHAT_BODIES:
+        return Response(content=STATIC_CHAT_BODIES[topic], media_type="application/json")
+    
+    # Calculate advanced metrics from per-type totals of completed transactions
+    totals = get_user_totals(db, current_user.id)
+    total_deposits = totals.get("deposit") or 0
+    total_withdrawals = totals.get("withdraw") or 0
     
-    if "risk" in message_lower or "safety" in message_lower:
+    if topic == "risk":
         response = f"Based on your ${total_deposits:.2f} in deposits, your risk profile appears moderate. Consider diversifying across different investment types."
         analysis = "Risk assessment completed. User shows balanced investment approach."
         recommendations = [
@@ -38,7 +84,7 @@ async def chat_with_ai(
             "Monitor market volatility indicators"
         ]
     
-    elif "growth" in message_lower or "profit" in message_lower:
+    else:  # growth
         growth_rate = ((total_deposits - total_withdrawals) / total_deposits * 100) if total_deposits > 0 else 0
         response = f"Your portfolio shows a {growth_rate:.1f}% growth rate. For better returns, consider compound interest strategies."
         analysis = "Growth analysis indicates positive trajectory with room for optimization."
@@ -48,43 +94,22 @@ async def chat_with_ai(
             "Consider long-term investment vehicles"
         ]
     
-    elif "market" in message_lower or "trend" in message_lower:
-        response = "Current market analysis suggests cryptocurrency volatility. Consider dollar-cost averaging for stable growth."
-        analysis = "Market trend analysis completed with volatility considerations."
-        recommendations = [
-            "Implement dollar-cost averaging strategy",
-            "Diversify across multiple cryptocurrencies",
-            "Set up price alerts for major movements"
-        ]
-    
-    else:
-        response = "I can help with risk assessment, growth analysis, market trends, and investment strategies. What specific area would you like to explore?"
-        analysis = "General inquiry - providing guidance on available AI features."
-        recommendations = [
-            "Ask about risk assessment",
-            "Request growth analysis",
-            "Get market trend insights"
-        ]
-        
-        return schemas.AIResponse(
-            response=response,
+    return schemas.AIResponse(
+        response=response,
         analysis=analysis,
         recommendations=recommendations
     )
 
 @router.get("/portfolio-analysis", response_model=schemas.AIResponse)
-async def get_portfolio_analysis(
+def get_portfolio_analysis(
     current_user: models.User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Advanced portfolio analysis with AI insights"""
-    transactions = db.query(models.Transaction).filter(
-        models.Transaction.user_id == current_user.id
-    ).all()
-    
-    # Calculate portfolio metrics
-    total_invested = sum(t.amount for t in transactions if t.type == "deposit" and t.status == "completed")
-    total_withdrawn = sum(t.amount for t in transactions if t.type == "withdraw" and t.status == "completed")
+    # Calculate portfolio metrics from per-type totals of completed transactions
+    totals = get_user_totals(db, current_user.id)
+    total_invested = totals.get("deposit") or 0
+    total_withdrawn = totals.get("withdraw") or 0
     net_position = total_invested - total_withdrawn
     growth_rate = ((net_position - total_withdrawn) / total_invested * 100) if total_invested > 0 else 0
     
@@ -123,18 +148,5 @@ async def get_market_prediction(
     db: Session = Depends(get_db)
 ):
     """AI-powered market prediction based on user's investment pattern"""
-    # Simulate AI market prediction
-    response = "Market Prediction: Based on current trends, expect 15-25% volatility in the next 30 days. Bitcoin showing bullish signals."
-    analysis = "AI analysis indicates favorable market conditions for strategic investments."
-    recommendations = [
-        "Consider increasing position sizes gradually",
-        "Set stop-loss orders at 10% below current prices",
-        "Diversify into emerging altcoins",
-        "Monitor regulatory news for market impact"
-    ]
-    
-    return schemas.AIResponse(
-        response=response,
-        analysis=analysis,
-        recommendations=recommendations
-        ) 
\ No newline at end of file
+    # Simulated AI market prediction, prebuilt at import
+    return Response(content=MARKET_PREDICTION_BODY, media_type="application/json")
@@ -5,6 +5,7 @@ from datetime import datetime
 
 from app.database import get_db
 from app import models, schemas, auth
+from app.portfolio import get_user_totals
 from app.crypto_service import crypto_service
 
 router = APIRouter()
@@ -12,7 +13,7 @@ router = APIRouter()
 @router.get("/prices", response_model=Dict[str, float])
 async def get_crypto_prices():
     """Get current prices for all supported cryptocurrencies"""
-    prices = crypto_service.get_crypto_prices()
+    prices = await crypto_service.get_crypto_prices()
     if not prices:
         raise HTTPException(status_code=500, detail="Failed to fetch crypto prices")
     return prices
@@ -20,7 +21,7 @@ async def get_crypto_prices():
 @router.get("/price/{coin_id}")
 async def get_crypto_price(coin_id: str):
     """Get current price for a specific cryptocurrency"""
-    price = crypto_service.get_crypto_price(coin_id)
+    price = await crypto_service.get_crypto_price(coin_id)
     if price is None:
         raise HTTPException(status_code=404, detail=f"Price not found for {coin_id}")
     return {"coin_id": coin_id, "price": price, "timestamp": datetime.utcnow()}
@@ -28,7 +29,7 @@ async def get_crypto_price(coin_id: str):
 @router.get("/market-data/{coin_id}", response_model=schemas.CryptoMarketData)
 async def get_crypto_market_data(coin_id: str):
     """Get detailed market data for a cryptocurrency"""
-    market_data = crypto_service.get_crypto_market_data(coin_id)
+    market_data = await crypto_service.get_crypto_market_data(coin_id)
     if not market_data:
         raise HTTPException(status_code=404, detail=f"Market data not found for {coin_id}")
     return market_data
@@ -40,24 +41,21 @@ async def calculate_investment(
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     """Calculate investment value and potential returns"""
-    calculation = crypto_service.calculate_investment_value(coin_id, amount)
+    calculation = await crypto_service.calculate_investment_value(coin_id, amount)
     if not calculation:
         raise HTTPException(status_code=400, detail=f"Could not calculate investment for {coin_id}")
     return calculation
 
 @router.get("/portfolio-value")
-async def get_portfolio_value(
+def get_portfolio_value(
     current_user: models.User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Calculate total portfolio value based on user's transactions"""
-    transactions = db.query(models.Transaction).filter(
-        models.Transaction.user_id == current_user.id,
-        models.Transaction.status == "completed"
-    ).all()
+    totals = get_user_totals(db, current_user.id)
     
-    total_invested = sum(t.amount for t in transactions if t.type == "deposit")
-    total_withdrawn = sum(t.amount for t in transactions if t.type == "withdraw")
+    total_invested = totals.get("deposit") or 0
+    total_withdrawn = totals.get("withdraw") or 0
     net_investment = total_invested - total_withdrawn
     
     # Simulate portfolio growth (in real app, you'd track actual crypto holdings)
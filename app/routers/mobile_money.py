@@ -1,4 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import Dict, Optional
 from datetime import datetime
@@ -9,66 +11,120 @@ from ..models import User, Transaction
 from ..schemas import MobileMoneyDeposit, MobileMoneyWithdrawal, TransactionStatus
 from ..auth import get_current_user
 from ..mobile_money_service import mobile_money_service
+from ..portfolio import invalidate_user_totals, invalidate_transaction_status
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Handlers and levels are configured once at startup by app.logging_config
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/mobile-money", tags=["Mobile Money"])
 
-@router.post("/deposit/mtn")
-async def initiate_mtn_deposit(
-    deposit_data: MobileMoneyDeposit,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+# Provider name -> label stored on transaction records
+PROVIDER_LABELS = {
+    "MTN": "MTN Mobile Money",
+    "Orange": "Orange Money"
+}
+
+# (provider, transaction type) -> service call that initiates it
+INITIATE_HANDLERS = {
+    ("MTN", "deposit"): mobile_money_service.initiate_mtn_deposit,
+    ("Orange", "deposit"): mobile_money_service.initiate_orange_deposit,
+    ("MTN", "withdrawal"): mobile_money_service.initiate_mtn_withdrawal,
+    ("Orange", "withdrawal"): mobile_money_service.initiate_orange_withdrawal
+}
+
+def _record_initiation(db: Session, transaction: Transaction) -> Optional[int]:
+    """Insert the pending transaction before the provider is called and return its id.
+
+    Withdrawals also deduct their amount, with one conditional UPDATE in the same
+    commit, so concurrent requests can't overdraw and a debit is never left without
+    its transaction row. Returns None if the balance doesn't cover a withdrawal.
+    """
+    if transaction.type == "withdrawal":
+        deducted = db.query(User).filter(
+            User.id == transaction.user_id, User.balance >= transaction.amount
+        ).update({User.balance: User.balance - transaction.amount}, synchronize_session=False)
+        if not deducted:
+            db.rollback()
+            return None
+    db.add(transaction)
+    db.flush()
+    transaction_pk = transaction.id
+    db.commit()
+    return transaction_pk
+
+def _settle_initiation(db: Session, transaction_pk: int, transaction_type: str, user_id: int, amount: float, result: Dict):
+    """Record the provider's answer; a rejected withdrawal is refunded in the same commit"""
+    query = db.query(Transaction).filter(Transaction.id == transaction_pk)
+    if result["success"]:
+        query.update({Transaction.transaction_id: result["transaction_id"]}, synchronize_session=False)
+    else:
+        query.update({Transaction.status: "failed"}, synchronize_session=False)
+        if transaction_type == "withdrawal":
+            db.query(User).filter(User.id == user_id).update(
+                {User.balance: User.balance + amount}, synchronize_session=False
+            )
+    db.commit()
+
+async def _initiate_transaction(
+    provider: str,
+    transaction_type: str,
+    data,
+    current_user: User,
+    db: Session
 ):
-    """Initiate MTN Mobile Money deposit"""
+    """Validate, initiate and record a mobile money deposit or withdrawal"""
+    label = PROVIDER_LABELS[provider]
+    user_id = current_user.id
     try:
         # Validate phone number
-        if not mobile_money_service.validate_phone_number(deposit_data.phone_number, "MTN"):
+        if not mobile_money_service.validate_phone_number(data.phone_number, provider):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid MTN phone number format"
+                detail=f"Invalid {provider} phone number format"
             )
         
         # Validate amount
-        if not mobile_money_service.validate_amount(deposit_data.amount, "deposit"):
+        if not mobile_money_service.validate_amount(data.amount, transaction_type):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid deposit amount. Must be between 100 and 500,000 XAF"
+                detail=f"Invalid {transaction_type} amount. Must be between 100 and 500,000 XAF"
             )
         
-        # Initiate deposit
-        result = await mobile_money_service.initiate_mtn_deposit(
-            phone_number=deposit_data.phone_number,
-            amount=deposit_data.amount,
-            user_id=current_user.id
+        transaction_pk = await run_in_threadpool(_record_initiation, db, Transaction(
+            user_id=user_id,
+            type=transaction_type,
+            amount=data.amount,
+            currency="XAF",
+            provider=label,
+            status="pending",
+            phone_number=data.phone_number,
+            description=f"{label} {transaction_type} of {data.amount} XAF"
+        ))
+        if transaction_pk is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Insufficient balance for withdrawal"
+            )
+        
+        # Provider failures come back as success=False. If the call raises instead, the
+        # outcome is unknown, so the transaction stays pending (and debited) for reconciliation
+        result = await INITIATE_HANDLERS[(provider, transaction_type)](
+            phone_number=data.phone_number,
+            amount=data.amount,
+            user_id=user_id
         )
+        await run_in_threadpool(
+            _settle_initiation, db, transaction_pk, transaction_type, user_id, data.amount, result
+        )
+        await run_in_threadpool(invalidate_user_totals, user_id)
         
         if result["success"]:
-            # Create transaction record
-            transaction = Transaction(
-                user_id=current_user.id,
-                type="deposit",
-                amount=deposit_data.amount,
-                currency="XAF",
-                provider="MTN Mobile Money",
-                status="pending",
-                transaction_id=result["transaction_id"],
-                phone_number=deposit_data.phone_number,
-                description=f"MTN Mobile Money deposit of {deposit_data.amount} XAF"
-            )
-            
-            db.add(transaction)
-            db.commit()
-            db.refresh(transaction)
-            
             return {
                 "success": True,
-                "message": "MTN Mobile Money deposit initiated successfully",
+                "message": f"{label} {transaction_type} initiated successfully",
                 "transaction_id": result["transaction_id"],
-                "amount": deposit_data.amount,
-                "phone_number": deposit_data.phone_number,
+                "amount": data.amount,
+                "phone_number": data.phone_number,
                 "status": "pending"
             }
         else:
@@ -80,12 +136,21 @@ async def initiate_mtn_deposit(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"MTN deposit error: {str(e)}")
+        logger.error("%s %s error: %s", provider, transaction_type, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to initiate MTN deposit"
+            detail=f"Failed to initiate {provider} {transaction_type}"
         )
 
+@router.post("/deposit/mtn")
+async def initiate_mtn_deposit(
+    deposit_data: MobileMoneyDeposit,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Initiate MTN Mobile Money deposit"""
+    return await _initiate_transaction("MTN", "deposit", deposit_data, current_user, db)
+
 @router.post("/deposit/orange")
 async def initiate_orange_deposit(
     deposit_data: MobileMoneyDeposit,
@@ -93,68 +158,7 @@ async def initiate_orange_deposit(
     db: Session = Depends(get_db)
 ):
     """Initiate Orange Money deposit"""
-    try:
-        # Validate phone number
-        if not mobile_money_service.validate_phone_number(deposit_data.phone_number, "Orange"):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid Orange phone number format"
-            )
-        
-        # Validate amount
-        if not mobile_money_service.validate_amount(deposit_data.amount, "deposit"):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid deposit amount. Must be between 100 and 500,000 XAF"
-            )
-        
-        # Initiate deposit
-        result = await mobile_money_service.initiate_orange_deposit(
-            phone_number=deposit_data.phone_number,
-            amount=deposit_data.amount,
-            user_id=current_user.id
-        )
-        
-        if result["success"]:
-            # Create transaction record
-            transaction = Transaction(
-                user_id=current_user.id,
-                type="deposit",
-                amount=deposit_data.amount,
-                currency="XAF",
-                provider="Orange Money",
-                status="pending",
-                transaction_id=result["transaction_id"],
-                phone_number=deposit_data.phone_number,
-                description=f"Orange Money deposit of {deposit_data.amount} XAF"
-            )
-            
-            db.add(transaction)
-            db.commit()
-            db.refresh(transaction)
-            
-            return {
-                "success": True,
-                "message": "Orange Money deposit initiated successfully",
-                "transaction_id": result["transaction_id"],
-                "amount": deposit_data.amount,
-                "phone_number": deposit_data.phone_number,
-                "status": "pending"
-            }
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=result["message"]
-            )
-            
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Orange deposit error: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to initiate Orange deposit"
-        )
+    return await _initiate_transaction("Orange", "deposit", deposit_data, current_user, db)
 
 @router.post("/withdrawal/mtn")
 async def initiate_mtn_withdrawal(
@@ -163,78 +167,7 @@ async def initiate_mtn_withdrawal(
     db: Session = Depends(get_db)
 ):
     """Initiate MTN Mobile Money withdrawal"""
-    try:
-        # Check if user has sufficient balance
-        if current_user.balance < withdrawal_data.amount:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Insufficient balance for withdrawal"
-            )
-        
-        # Validate phone number
-        if not mobile_money_service.validate_phone_number(withdrawal_data.phone_number, "MTN"):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid MTN phone number format"
-            )
-        
-        # Validate amount
-        if not mobile_money_service.validate_amount(withdrawal_data.amount, "withdrawal"):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid withdrawal amount. Must be between 100 and 500,000 XAF"
-            )
-        
-        # Initiate withdrawal
-        result = await mobile_money_service.initiate_mtn_withdrawal(
-            phone_number=withdrawal_data.phone_number,
-            amount=withdrawal_data.amount,
-            user_id=current_user.id
-        )
-        
-        if result["success"]:
-            # Deduct from user balance
-            current_user.balance -= withdrawal_data.amount
-            
-            # Create transaction record
-            transaction = Transaction(
-                user_id=current_user.id,
-                type="withdrawal",
-                amount=withdrawal_data.amount,
-                currency="XAF",
-                provider="MTN Mobile Money",
-                status="pending",
-                transaction_id=result["transaction_id"],
-                phone_number=withdrawal_data.phone_number,
-                description=f"MTN Mobile Money withdrawal of {withdrawal_data.amount} XAF"
-            )
-            
-            db.add(transaction)
-            db.commit()
-            db.refresh(transaction)
-            
-            return {
-                "success": True,
-                "message": "MTN Mobile Money withdrawal initiated successfully",
-                "transaction_id": result["transaction_id"],
-                "amount": withdrawal_data.amount,
-                "phone_number": withdrawal_data.phone_number,
-                "status": "pending"
-            }
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=result["message"]
-            )
-            
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"MTN withdrawal error: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to initiate MTN withdrawal"
-        )
+    return await _initiate_transaction("MTN", "withdrawal", withdrawal_data, current_user, db)
 
 @router.post("/withdrawal/orange")
 async def initiate_orange_withdrawal(
@@ -243,78 +176,7 @@ async def initiate_orange_withdrawal(
     db: Session = Depends(get_db)
 ):
     """Initiate Orange Money withdrawal"""
-    try:
-        # Check if user has sufficient balance
-        if current_user.balance < withdrawal_data.amount:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Insufficient balance for withdrawal"
-            )
-        
-        # Validate phone number
-        if not mobile_money_service.validate_phone_number(withdrawal_data.phone_number, "Orange"):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid Orange phone number format"
-            )
-        
-        # Validate amount
-        if not mobile_money_service.validate_amount(withdrawal_data.amount, "withdrawal"):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid withdrawal amount. Must be between 100 and 500,000 XAF"
-            )
-        
-        # Initiate withdrawal
-        result = await mobile_money_service.initiate_orange_withdrawal(
-            phone_number=withdrawal_data.phone_number,
-            amount=withdrawal_data.amount,
-            user_id=current_user.id
-        )
-        
-        if result["success"]:
-            # Deduct from user balance
-            current_user.balance -= withdrawal_data.amount
-            
-            # Create transaction record
-            transaction = Transaction(
-                user_id=current_user.id,
-                type="withdrawal",
-                amount=withdrawal_data.amount,
-                currency="XAF",
-                provider="Orange Money",
-                status="pending",
-                transaction_id=result["transaction_id"],
-                phone_number=withdrawal_data.phone_number,
-                description=f"Orange Money withdrawal of {withdrawal_data.amount} XAF"
-            )
-            
-            db.add(transaction)
-            db.commit()
-            db.refresh(transaction)
-            
-            return {
-                "success": True,
-                "message": "Orange Money withdrawal initiated successfully",
-                "transaction_id": result["transaction_id"],
-                "amount": withdrawal_data.amount,
-                "phone_number": withdrawal_data.phone_number,
-                "status": "pending"
-            }
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=result["message"]
-            )
-            
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Orange withdrawal error: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to initiate Orange withdrawal"
-        )
+    return await _initiate_transaction("Orange", "withdrawal", withdrawal_data, current_user, db)
 
 @router.get("/transaction/{transaction_id}")
 async def get_transaction_status(
@@ -324,11 +186,13 @@ async def get_transaction_status(
 ):
     """Get the status of a mobile money transaction"""
     try:
-        # Check if transaction exists in database
-        transaction = db.query(Transaction).filter(
-            Transaction.transaction_id == transaction_id,
-            Transaction.user_id == current_user.id
-        ).first()
+        # Check if transaction exists in database (sessions are blocking, so keep them off the event loop)
+        transaction = await run_in_threadpool(
+            db.query(Transaction).filter(
+                Transaction.transaction_id == transaction_id,
+                Transaction.user_id == current_user.id
+            ).first
+        )
         
         if not transaction:
             raise HTTPException(
@@ -342,7 +206,10 @@ async def get_transaction_status(
         if status_result["success"]:
             # Update transaction status in database
             transaction.status = status_result["status"]
-            db.commit()
+            user_id, transaction_pk = current_user.id, transaction.id
+            await run_in_threadpool(db.commit)
+            await run_in_threadpool(invalidate_user_totals, user_id)
+            await run_in_threadpool(invalidate_transaction_status, user_id, transaction_pk)
             
             return {
                 "success": True,
@@ -365,25 +232,53 @@ async def get_transaction_status(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Transaction status error: {str(e)}")
+        logger.error("Transaction status error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to get transaction status"
         )
 
 @router.get("/transactions")
-async def get_user_transactions(
+def get_user_transactions(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
     skip: int = 0,
-    limit: int = 10
+    limit: int = 10,
+    before_id: Optional[int] = None
 ):
-    """Get user's mobile money transactions"""
+    """Get user's mobile money transactions, newest first
+
+    Pass the last id of the previous page as before_id to continue from it without
+    an OFFSET scan; otherwise skip is used.
+    """
     try:
-        transactions = db.query(Transaction).filter(
+        query = db.query(
+            Transaction.id,
+            Transaction.transaction_id,
+            Transaction.type,
+            Transaction.amount,
+            Transaction.currency,
+            Transaction.provider,
+            Transaction.status,
+            Transaction.phone_number,
+            Transaction.description,
+            Transaction.created_at
+        ).filter(
             Transaction.user_id == current_user.id,
-            Transaction.provider.in_(["MTN Mobile Money", "Orange Money"])
-        ).offset(skip).limit(limit).all()
+            Transaction.provider.in_(PROVIDER_LABELS.values())
+        )
+        page_query = query
+        if before_id is not None:
+            page_query = page_query.filter(Transaction.id < before_id)
+            skip = 0
+        # The total is counted over the whole filter in the same query (COUNT(*) OVER ())
+        transactions = page_query.add_columns(
+            func.count().over().label("total_count")
+        ).order_by(Transaction.id.desc()).offset(skip).limit(limit).all()
+        if transactions and before_id is None:
+            total = transactions[0].total_count
+        else:
+            total = query.count()
         
         return {
             "success": True,
@@ -402,11 +297,12 @@ async def get_user_transactions(
                 }
                 for t in transactions
             ],
-            "total": len(transactions)
+            "total": total,
+            "next_before_id": transactions[-1].id if len(transactions) == limit else None
         }
         
     except Exception as e:
-        logger.error(f"Get transactions error: {str(e)}")
+        logger.error("Get transactions error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to get transactions"
@@ -419,7 +315,7 @@ async def mtn_callback(callback_data: Dict):
         result = await mobile_money_service.process_callback("MTN", callback_data)
         return result
     except Exception as e:
-        logger.error(f"MTN callback error: {str(e)}")
+        logger.error("MTN callback error: %s", e)
         return {"success": False, "error": str(e)}
 
 @router.post("/callback/orange")
@@ -429,5 +325,5 @@ async def orange_callback(callback_data: Dict):
         result = await mobile_money_service.process_callback("Orange", callback_data)
         return result
     except Exception as e:
-        logger.error(f"Orange callback error: {str(e)}")
+        logger.error("Orange callback error: %s", e)
         return {"success": False, "error": str(e)} 
\ No newline at end of file
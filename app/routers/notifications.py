@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, BackgroundTasks
 from sqlalchemy.orm import Session
 from typing import Dict
 from datetime import datetime
@@ -9,19 +9,17 @@ from app.email_service import email_service
 
 router = APIRouter()
 
-@router.post("/send-welcome")
+@router.post("/send-welcome", status_code=202)
 async def send_welcome_email(
     user_email: str,
     user_name: str = None,
     background_tasks: BackgroundTasks = None
 ):
     """Send welcome email to new user"""
-    success = await email_service.send_welcome_email(user_email, user_name)
-    if not success:
-        raise HTTPException(status_code=500, detail="Failed to send welcome email")
-    return {"message": "Welcome email sent successfully"}
+    background_tasks.add_task(email_service.send_welcome_email, user_email, user_name)
+    return {"message": "Welcome email queued"}
 
-@router.post("/send-transaction-notification")
+@router.post("/send-transaction-notification", status_code=202)
 async def send_transaction_notification(
     user_email: str,
     transaction_type: str,
@@ -30,33 +28,27 @@ async def send_transaction_notification(
     background_tasks: BackgroundTasks = None
 ):
     """Send transaction notification email"""
-    success = await email_service.send_transaction_notification(user_email, transaction_type, amount, status)
-    if not success:
-        raise HTTPException(status_code=500, detail="Failed to send transaction notification")
-    return {"message": "Transaction notification sent successfully"}
+    background_tasks.add_task(email_service.send_transaction_notification, user_email, transaction_type, amount, status)
+    return {"message": "Transaction notification queued"}
 
-@router.post("/send-security-alert")
+@router.post("/send-security-alert", status_code=202)
 async def send_security_alert(
     alert: schemas.UserSecurityAlert,
     background_tasks: BackgroundTasks = None
 ):
     """Send security alert email"""
-    success = await email_service.send_security_alert(alert.user_email, alert.alert_type, alert.details)
-    if not success:
-        raise HTTPException(status_code=500, detail="Failed to send security alert")
-    return {"message": "Security alert sent successfully"}
+    background_tasks.add_task(email_service.send_security_alert, alert.user_email, alert.alert_type, alert.details)
+    return {"message": "Security alert queued"}
 
-@router.post("/send-investment-insights")
+@router.post("/send-investment-insights", status_code=202)
 async def send_investment_insights(
     user_email: str,
     insights: Dict,
     background_tasks: BackgroundTasks = None
 ):
     """Send AI-powered investment insights email"""
-    success = await email_service.send_investment_insights(user_email, insights)
-    if not success:
-        raise HTTPException(status_code=500, detail="Failed to send investment insights")
-    return {"message": "Investment insights sent successfully"}
+    background_tasks.add_task(email_service.send_investment_insights, user_email, insights)
+    return {"message": "Investment insights queued"}
 
 @router.get("/notification-preferences")
 async def get_notification_preferences(
@@ -1,59 +1,95 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import Dict
 
 from app.database import get_db
 from app import models, schemas, auth
 from app.payment_service import payment_service
+from app.email_service import email_service
+from app.portfolio import invalidate_user_totals, get_cached_transaction_status, cache_transaction_status
 
 router = APIRouter()
 
-@router.post("/create-payment-intent", response_model=Dict)
+TRANSACTION_HASH_INDEX = "uq_transactions_transaction_hash"
+
+def _is_duplicate_hash(error: IntegrityError) -> bool:
+    """Whether an insert failed on the unique transaction_hash index (not a check or FK)"""
+    # PostgreSQL names the violated constraint; SQLite only reports the column
+    diag = getattr(error.orig, "diag", None)
+    if diag is not None and diag.constraint_name:
+        return diag.constraint_name == TRANSACTION_HASH_INDEX
+    return "transactions.transaction_hash" in str(error.orig)
+
+@router.post("/create-payment-intent", response_model=schemas.PaymentIntentResponse)
 async def create_payment_intent(
     payment: schemas.PaymentIntent,
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     """Create a payment intent for deposit"""
-    if payment.amount < 10:
-        raise HTTPException(status_code=400, detail="Minimum deposit amount is $10")
-    
-    if payment.amount > 10000:
-        raise HTTPException(status_code=400, detail="Maximum deposit amount is $10,000")
-    
-    payment_data = payment_service.create_payment_intent(payment.amount, current_user.email)
+    payment_data = await payment_service.create_payment_intent(payment.amount, current_user.email)
     if not payment_data:
         raise HTTPException(status_code=500, detail="Failed to create payment intent")
     
-    return payment_data
+    return schemas.PaymentIntentResponse(**payment_data)
+
+def _record_deposit(db: Session, transaction: models.Transaction) -> bool:
+    """Store a completed deposit and credit its amount to the user's balance.
+
+    Returns False without crediting anything if a transaction with the same hash was
+    already recorded (the unique index on transaction_hash rejects the insert).
+    """
+    try:
+        db.add(transaction)
+        db.flush()
+    except IntegrityError as e:
+        db.rollback()
+        if _is_duplicate_hash(e):
+            return False
+        raise
+    # Incremented in SQL so a concurrent balance change isn't overwritten
+    db.query(models.User).filter(models.User.id == transaction.user_id).update(
+        {models.User.balance: models.User.balance + transaction.amount}, synchronize_session=False
+    )
+    db.commit()
+    return True
 
 @router.post("/confirm-payment", response_model=schemas.PaymentConfirmation)
 async def confirm_payment(
     payment_intent_id: str,
+    background_tasks: BackgroundTasks,
     current_user: models.User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Confirm a payment and create transaction"""
-    payment_data = payment_service.confirm_payment(payment_intent_id)
+    user_id, user_email = current_user.id, current_user.email
+    # Hand the connection used for authentication back to the pool while Stripe is called
+    await run_in_threadpool(db.rollback)
+    
+    payment_data = await payment_service.confirm_payment(payment_intent_id)
     if not payment_data:
         raise HTTPException(status_code=400, detail="Invalid payment intent")
     
     if payment_data["status"] == "succeeded":
         # Create transaction record
         transaction = models.Transaction(
-            user_id=current_user.id,
+            user_id=user_id,
             type="deposit",
             amount=payment_data["amount"],
             status="completed",
             transaction_hash=payment_intent_id,
             notes=f"Payment confirmed via {payment_data['currency']}"
         )
-        db.add(transaction)
         
-        # Update user balance
-        current_user.balance += payment_data["amount"]
-        
-        db.commit()
-        db.refresh(transaction)
+        # Sessions are blocking, so keep them off the event loop
+        # A retried confirmation of an already recorded intent is answered without crediting again
+        if await run_in_threadpool(_record_deposit, db, transaction):
+            await run_in_threadpool(invalidate_user_totals, user_id)
+            # The receipt is sent after the response goes out
+            background_tasks.add_task(
+                email_service.send_transaction_notification, user_email, "deposit", payment_data["amount"], "completed"
+            )
         
         return schemas.PaymentConfirmation(
             payment_intent_id=payment_intent_id,
@@ -65,30 +101,36 @@ async def confirm_payment(
         raise HTTPException(status_code=400, detail=f"Payment failed with status: {payment_data['status']}")
 
 @router.post("/withdrawal", response_model=schemas.WithdrawalResponse)
-async def create_withdrawal(
+def create_withdrawal(
     withdrawal: schemas.WithdrawalRequest,
+    background_tasks: BackgroundTasks,
     current_user: models.User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Create a withdrawal request"""
-    if withdrawal.amount > current_user.balance:
+    user_id, user_email = current_user.id, current_user.email
+    # Deduct with one conditional UPDATE, so concurrent withdrawals can't both pass the
+    # balance check and overdraw; it commits together with the transaction record below
+    deducted = db.query(models.User).filter(
+        models.User.id == user_id,
+        models.User.balance >= withdrawal.amount
+    ).update({models.User.balance: models.User.balance - withdrawal.amount}, synchronize_session=False)
+    if not deducted:
         raise HTTPException(status_code=400, detail="Insufficient balance")
     
-    if withdrawal.amount < 5:
-        raise HTTPException(status_code=400, detail="Minimum withdrawal amount is $5")
-    
     withdrawal_data = payment_service.create_withdrawal_request(
         withdrawal.amount, 
         withdrawal.wallet_address, 
-        current_user.email
+        user_email
     )
     
     if not withdrawal_data:
+        db.rollback()
         raise HTTPException(status_code=500, detail="Failed to create withdrawal request")
     
     # Create transaction record
     transaction = models.Transaction(
-        user_id=current_user.id,
+        user_id=user_id,
         type="withdraw",
         amount=withdrawal.amount,
         status="pending",
@@ -96,26 +138,30 @@ async def create_withdrawal(
         notes=f"Withdrawal to {withdrawal.network} network"
     )
     db.add(transaction)
-    
-    # Deduct from user balance
-    current_user.balance -= withdrawal.amount
-    
     db.commit()
+    invalidate_user_totals(user_id)
+    background_tasks.add_task(
+        email_service.send_transaction_notification, user_email, "withdrawal", withdrawal.amount, "pending"
+    )
     
     return schemas.WithdrawalResponse(**withdrawal_data)
 
-@router.get("/payment-methods", response_model=Dict)
+@router.get("/payment-methods", response_model=Dict[str, schemas.PaymentMethod])
 async def get_payment_methods():
     """Get available payment methods"""
     return payment_service.get_payment_methods()
 
 @router.get("/transaction-status/{transaction_id}")
-async def get_transaction_status(
+def get_transaction_status(
     transaction_id: int,
     current_user: models.User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Get status of a specific transaction"""
+    cached = get_cached_transaction_status(current_user.id, transaction_id)
+    if cached is not None:
+        return cached
+    
     transaction = db.query(models.Transaction).filter(
         models.Transaction.id == transaction_id,
         models.Transaction.user_id == current_user.id
@@ -124,11 +170,13 @@ async def get_transaction_status(
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
-    return {
+    payload = {
         "transaction_id": transaction.id,
         "type": transaction.type,
         "amount": transaction.amount,
         "status": transaction.status,
-        "timestamp": transaction.timestamp,
+        "timestamp": transaction.created_at.isoformat(),
         "wallet_address": transaction.wallet_address
-    }
\ No newline at end of file
+    }
+    cache_transaction_status(current_user.id, transaction_id, payload)
+    return payload
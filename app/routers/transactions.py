@@ -1,14 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import delete, tuple_, update
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 
 from app.database import get_db
 from app import models, schemas, auth
+from app.portfolio import invalidate_user_totals, invalidate_transaction_status
 
 router = APIRouter()
 
 @router.post("/", response_model=schemas.TransactionResponse)
-async def create_transaction(
+def create_transaction(
     transaction: schemas.TransactionCreate,
     current_user: models.User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
@@ -21,72 +24,96 @@ async def create_transaction(
         wallet_address=transaction.wallet_address
     )
     db.add(db_transaction)
+    # The INSERT returns the generated id and created_at, so the response is built from the
+    # flushed row before commit expires it, with no refresh query afterwards
+    db.flush()
+    response = schemas.TransactionResponse.model_validate(db_transaction)
     db.commit()
-    db.refresh(db_transaction)
-    return db_transaction
+    invalidate_user_totals(response.user_id)
+    return response
 
 @router.get("/", response_model=List[schemas.TransactionResponse])
-async def get_user_transactions(
+def get_user_transactions(
+    request: Request,
+    response: Response,
     current_user: models.User = Depends(auth.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    limit: int = Query(50, ge=1, le=200),
+    after_created_at: Optional[datetime] = None,
+    after_id: Optional[int] = None
 ):
-    """Get all transactions for current user"""
-    transactions = db.query(models.Transaction).filter(models.Transaction.user_id == current_user.id).all()
+    """Get transactions for current user, newest first
+
+    Pass the created_at and id of the last transaction of the previous page to get the
+    next one (keyset pagination over the user_id, created_at index). When more rows
+    remain, a Link header with rel="next" carries the URL of the next page.
+    """
+    query = db.query(models.Transaction).filter(models.Transaction.user_id == current_user.id)
+    if after_created_at is not None and after_id is not None:
+        query = query.filter(
+            tuple_(models.Transaction.created_at, models.Transaction.id) < (after_created_at, after_id)
+        )
+    # One extra row tells whether another page follows
+    transactions = query.order_by(
+        models.Transaction.created_at.desc(), models.Transaction.id.desc()
+    ).limit(limit + 1).all()
+    if len(transactions) > limit:
+        transactions = transactions[:limit]
+        last = transactions[-1]
+        next_url = request.url.include_query_params(
+            limit=limit, after_created_at=last.created_at.isoformat(), after_id=last.id
+        )
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
     return transactions
 
 @router.get("/{transaction_id}", response_model=schemas.TransactionResponse)
-async def get_transaction(
+def get_transaction(
     transaction_id: int,
-    current_user: models.User = Depends(auth.get_current_active_user),
-    db: Session = Depends(get_db)
+    transaction: models.Transaction = Depends(auth.get_current_user_transaction)
 ):
     """Get a specific transaction"""
-    transaction = db.query(models.Transaction).filter(
-        models.Transaction.id == transaction_id,
-        models.Transaction.user_id == current_user.id
-    ).first()
-    
-    if not transaction:
-        raise HTTPException(status_code=404, detail="Transaction not found")
-    
     return transaction
 
 @router.put("/{transaction_id}", response_model=schemas.TransactionResponse)
-async def update_transaction_status(
+def update_transaction_status(
     transaction_id: int,
     status: str,
     current_user: models.User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Update transaction status"""
-    transaction = db.query(models.Transaction).filter(
-        models.Transaction.id == transaction_id,
-        models.Transaction.user_id == current_user.id
-    ).first()
-    
-    if not transaction:
+    # A single UPDATE ... RETURNING both scopes the change to the user and yields the response row
+    transaction = db.execute(
+        update(models.Transaction)
+        .where(models.Transaction.id == transaction_id, models.Transaction.user_id == current_user.id)
+        .values(status=status)
+        .returning(models.Transaction)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+    if transaction is None:
         raise HTTPException(status_code=404, detail="Transaction not found")
-    
-    transaction.status = status
+    response = schemas.TransactionResponse.model_validate(transaction)
     db.commit()
-    db.refresh(transaction)
-    return transaction
+    invalidate_user_totals(response.user_id)
+    invalidate_transaction_status(response.user_id, transaction_id)
+    return response
 
 @router.delete("/{transaction_id}")
-async def delete_transaction(
+def delete_transaction(
     transaction_id: int,
     current_user: models.User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Delete a transaction"""
-    transaction = db.query(models.Transaction).filter(
-        models.Transaction.id == transaction_id,
-        models.Transaction.user_id == current_user.id
-    ).first()
-    
-    if not transaction:
+    user_id = current_user.id
+    result = db.execute(
+        delete(models.Transaction)
+        .where(models.Transaction.id == transaction_id, models.Transaction.user_id == user_id)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Transaction not found")
-    
-    db.delete(transaction)
     db.commit()
+    invalidate_user_totals(user_id)
+    invalidate_transaction_status(user_id, transaction_id)
     return {"message": "Transaction deleted successfully"} 
\ No newline at end of file
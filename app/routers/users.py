@@ -113,7 +113,7 @@ async def login_user(login_data: schemas.UserLogin, db: Session = Depends(get_db
     logger.info(f"Attempting unified login for: {login_data.email}")
     try:
         # Use the unified authentication function
-        auth_result = auth.authenticate_user_or_admin(login_data.email, login_data.password, db)
+        auth_result = await auth.authenticate_user_or_admin(login_data.email, login_data.password, db)
         
         if not auth_result:
             logger.warning(f"Login failed: Invalid credentials for {login_data.email}")
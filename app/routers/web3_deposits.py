@@ -1,4 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from typing import Dict, Optional
 from datetime import datetime
@@ -8,6 +10,7 @@ from app.database import get_db
 from app import models, schemas
 from app.auth import get_current_active_user
 from app.web3_service import web3_service
+from app.portfolio import invalidate_user_totals
 
 router = APIRouter()
 
@@ -119,17 +122,22 @@ async def verify_web3_deposit(
         deposit.transaction_hash = verification.tx_hash
         deposit.notes = f"Verified on {verification.network}: {verification_result['amount']} USDT"
         
-        # Update user balance
+        # Credit the balance in SQL so a concurrent balance change isn't overwritten
         usd_amount = web3_service.convert_usdt_to_usd(verification_result["amount"])
-        current_user.balance += usd_amount
+        user_id = current_user.id
+        new_balance = db.execute(
+            update(models.User).where(models.User.id == user_id)
+            .values(balance=models.User.balance + usd_amount).returning(models.User.balance)
+        ).scalar_one()
         
         db.commit()
+        await run_in_threadpool(invalidate_user_totals, user_id)
         
         return {
             "verified": True,
             "usdt_amount": verification_result["amount"],
             "usd_amount": usd_amount,
-            "new_balance": current_user.balance,
+            "new_balance": new_balance,
             "message": f"Deposit verified! {verification_result['amount']} USDT = ${usd_amount} USD"
         }
     else:
@@ -336,20 +344,42 @@ async def process_web3_withdrawal(
         db.commit()
         raise HTTPException(status_code=400, detail=eligibility["error"])
     
+    # Deduct before sending, in one conditional UPDATE, so concurrent withdrawals can't
+    # both pass the balance check and overdraw; the amount is returned if the send fails
+    user_id, amount = current_user.id, withdrawal.amount
+    new_balance = db.execute(
+        update(models.User).where(models.User.id == user_id, models.User.balance >= amount)
+        .values(balance=models.User.balance - amount).returning(models.User.balance)
+    ).scalar_one_or_none()
+    if new_balance is None:
+        withdrawal.status = "failed"
+        withdrawal.notes = "Processing failed: Insufficient balance"
+        db.commit()
+        raise HTTPException(status_code=400, detail="Insufficient balance")
+    db.commit()
+    
     try:
-        # Send USDT based on network
-        if withdrawal.provider == "TRC20":
-            result = web3_service.send_usdt_trc20(
-                withdrawal.wallet_address,
-                withdrawal.amount
-            )
-        elif withdrawal.provider == "BEP20":
-            result = web3_service.send_usdt_bep20(
-                withdrawal.wallet_address,
-                withdrawal.amount
-            )
-        else:
-            raise HTTPException(status_code=400, detail="Invalid network")
+        result = None
+        try:
+            # Send USDT based on network
+            if withdrawal.provider == "TRC20":
+                result = web3_service.send_usdt_trc20(
+                    withdrawal.wallet_address,
+                    withdrawal.amount
+                )
+            elif withdrawal.provider == "BEP20":
+                result = web3_service.send_usdt_bep20(
+                    withdrawal.wallet_address,
+                    withdrawal.amount
+                )
+            else:
+                raise HTTPException(status_code=400, detail="Invalid network")
+        finally:
+            if not (result and result["success"]):
+                db.query(models.User).filter(models.User.id == user_id).update(
+                    {models.User.balance: models.User.balance + amount}, synchronize_session=False
+                )
+                db.commit()
         
         if result["success"]:
             # Update transaction
@@ -357,10 +387,8 @@ async def process_web3_withdrawal(
             withdrawal.transaction_hash = result["tx_hash"]
             withdrawal.notes = f"Withdrawal completed on {result['network']}"
             
-            # Update user balance
-            current_user.balance -= withdrawal.amount
-            
             db.commit()
+            await run_in_threadpool(invalidate_user_totals, user_id)
             
             return {
                 "success": True,
@@ -368,7 +396,7 @@ async def process_web3_withdrawal(
                 "tx_hash": result["tx_hash"],
                 "amount": result["amount"],
                 "network": result["network"],
-                "new_balance": current_user.balance,
+                "new_balance": new_balance,
                 "message": f"Withdrawal successful! {result['amount']} USDT sent to {withdrawal.wallet_address}"
             }
         else:
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List
 from datetime import datetime
 
@@ -31,7 +31,7 @@ class TransactionBase(BaseModel):
     wallet_address: Optional[str] = None
 
 class TransactionCreate(TransactionBase):
-    pass
+    amount: float = Field(gt=0)
 
 class TransactionResponse(TransactionBase):
     id: int
@@ -115,10 +115,23 @@ class InvestmentCalculation(BaseModel):
 
 # Payment schemas
 class PaymentIntent(BaseModel):
-    amount: float
+    # Deposits are limited to $10 - $10,000
+    amount: float = Field(ge=10, le=10000)
     currency: str = "usd"
     payment_method: str
 
+class PaymentIntentResponse(BaseModel):
+    client_secret: str
+    payment_intent_id: str
+    amount: float
+    currency: str
+
+class PaymentMethod(BaseModel):
+    enabled: bool
+    min_amount: float
+    max_amount: float
+    processing_fee: float
+
 class PaymentConfirmation(BaseModel):
     payment_intent_id: str
     status: str
@@ -126,7 +139,8 @@ class PaymentConfirmation(BaseModel):
     currency: str
 
 class WithdrawalRequest(BaseModel):
-    amount: float
+    # Minimum withdrawal is $5
+    amount: float = Field(ge=5)
     wallet_address: str
     network: str = "TRC20"
 
@@ -232,11 +246,16 @@ class AdminUserList(BaseModel):
     page: int
     page_size: int
 
+class PageCursor(BaseModel):
+    after_created_at: datetime
+    after_id: int
+
 class AdminTransactionList(BaseModel):
     transactions: List[AdminTransaction]
     total_count: int
     page: int
     page_size: int
+    next_cursor: Optional[PageCursor] = None
 
 class AdminUserUpdate(BaseModel):
     status: Optional[str] = None
@@ -3,9 +3,9 @@
 Web3 Service for USDT TRC20 and BEP20 Integration
 """
 
+import asyncio
 import os
 import json
-import asyncio
 import secrets
 import string
 from typing import Optional, Dict, List
@@ -19,6 +19,7 @@ from tronpy.keys import PrivateKey
 # Import models for database operations
 from app import models
 from app.database import SessionLocal
+from app.portfolio import invalidate_user_totals
 
 class Web3Service:
     def __init__(self):
@@ -497,69 +498,59 @@ class Web3Service:
         
         return {"eligible": True, "platform_balance": platform_balance}
 
-    async def monitor_deposits(self, db_session, check_interval: int = 30):
-        """Monitor for new deposits (background task)"""
-        while True:
-            try:
-                # First, expire old deposit addresses
-                self.expire_deposit_addresses()
+    async def check_pending_deposits(self, db_session):
+        """Check pending deposit addresses once and credit any that were funded"""
+        # First, expire old deposit addresses
+        self.expire_deposit_addresses()
+        
+        # Get pending deposit addresses
+        pending_addresses = db_session.query(models.Web3DepositAddress).filter(
+            models.Web3DepositAddress.status == "pending",
+            models.Web3DepositAddress.expires_at > datetime.utcnow()
+        ).all()
+        
+        for deposit_address in pending_addresses:
+            # Check if funds were received at the address
+            if deposit_address.network == "TRC20":
+                balance = self.get_usdt_balance_trc20(deposit_address.address)
+            elif deposit_address.network == "BEP20":
+                balance = self.get_usdt_balance_bep20(deposit_address.address)
+            else:
+                continue
+            
+            # If funds were received and amount matches
+            if balance >= deposit_address.amount:
+                # Mark deposit address as completed
+                deposit_address.status = "completed"
+                deposit_address.completed_at = datetime.utcnow()
                 
-                # Get pending deposit addresses
-                pending_addresses = db_session.query(models.Web3DepositAddress).filter(
-                    models.Web3DepositAddress.status == "pending",
-                    models.Web3DepositAddress.expires_at > datetime.utcnow()
-                ).all()
+                # Create transaction record
+                transaction = models.Transaction(
+                    user_id=deposit_address.user_id,
+                    type="deposit",
+                    amount=deposit_address.amount,
+                    currency="USDT",
+                    status="completed",
+                    provider=deposit_address.network,
+                    network=deposit_address.network,
+                    deposit_address_id=deposit_address.id,
+                    description=f"USDT deposit on {deposit_address.network} network",
+                    notes="Auto-verified from deposit address"
+                )
                 
-                for deposit_address in pending_addresses:
-                    # Check if funds were received at the address
-                    if deposit_address.network == "TRC20":
-                        balance = self.get_usdt_balance_trc20(deposit_address.address)
-                    elif deposit_address.network == "BEP20":
-                        balance = self.get_usdt_balance_bep20(deposit_address.address)
-                    else:
-                        continue
-                    
-                    # If funds were received and amount matches
-                    if balance >= deposit_address.amount:
-                        # Mark deposit address as completed
-                        deposit_address.status = "completed"
-                        deposit_address.completed_at = datetime.utcnow()
-                        
-                        # Create transaction record
-                        transaction = models.Transaction(
-                            user_id=deposit_address.user_id,
-                            type="deposit",
-                            amount=deposit_address.amount,
-                            currency="USDT",
-                            status="completed",
-                            provider=deposit_address.network,
-                            network=deposit_address.network,
-                            deposit_address_id=deposit_address.id,
-                            description=f"USDT deposit on {deposit_address.network} network",
-                            notes="Auto-verified from deposit address"
-                        )
-                        
-                        # Update user balance
-                        user = db_session.query(models.User).filter(
-                            models.User.id == deposit_address.user_id
-                        ).first()
-                        
-                        if user:
-                            usd_amount = self.convert_usdt_to_usd(deposit_address.amount)
-                            user.balance += usd_amount
-                        
-                        db_session.add(transaction)
-                        db_session.commit()
-                        
-                        print(f"✅ Auto-verified deposit: {deposit_address.amount} USDT -> {usd_amount} USD")
-                    else:
-                        print(f"⏳ Waiting for deposit: {deposit_address.amount} USDT at {deposit_address.address}")
+                # Credit the balance in SQL so a concurrent balance change isn't overwritten
+                usd_amount = self.convert_usdt_to_usd(deposit_address.amount)
+                db_session.query(models.User).filter(
+                    models.User.id == deposit_address.user_id
+                ).update({models.User.balance: models.User.balance + usd_amount}, synchronize_session=False)
                 
-                await asyncio.sleep(check_interval)
+                db_session.add(transaction)
+                db_session.commit()
+                await asyncio.to_thread(invalidate_user_totals, deposit_address.user_id)
                 
-            except Exception as e:
-                print(f"Error monitoring deposits: {e}")
-                await asyncio.sleep(check_interval)
+                print(f"✅ Auto-verified deposit: {deposit_address.amount} USDT -> {usd_amount} USD")
+            else:
+                print(f"⏳ Waiting for deposit: {deposit_address.amount} USDT at {deposit_address.address}")
 
 # Create global instance
 web3_service = Web3Service() 
\ No newline at end of file
@@ -5,6 +5,7 @@ Database migration script to initialize or migrate schema for both SQLite and Po
 
 import sys
 import os
+import json
 import logging
 from sqlalchemy import text
 from app.database import engine, SessionLocal
@@ -50,6 +51,22 @@ def get_table_columns(db, table_name, dialect):
         return [row[0] for row in result.fetchall()]
 
 
+def get_column_type(db, table_name, column_name, dialect):
+    """Get the declared type of a column, lower-cased, or None if it doesn't exist"""
+    if dialect == "sqlite":
+        result = db.execute(text(f"PRAGMA table_info({table_name})"))
+        types = {row[1]: row[2] for row in result.fetchall()}
+        column_type = types.get(column_name)
+    else:  # postgresql
+        result = db.execute(text(f"""
+            SELECT data_type FROM information_schema.columns
+            WHERE table_name = '{table_name}' AND column_name = '{column_name}'
+        """))
+        row = result.fetchone()
+        column_type = row[0] if row else None
+    return column_type.lower() if column_type else None
+
+
 def migrate_database():
     """Perform the migration logic"""
     logger.info("Starting database migration...")
@@ -101,6 +118,81 @@ def migrate_database():
             else:
                 logger.info(f"{tbl} table already exists.")
 
+        # Move admin permissions from the JSON column into admin_permissions rows
+        if not table_exists(db, "admin_permissions", dialect):
+            logger.info("admin_permissions table missing — creating it...")
+            models.AdminPermission.__table__.create(bind=engine, checkfirst=True)
+            logger.info("admin_permissions table created successfully.")
+
+        logger.info("Backfilling admin permissions...")
+        for admin in db.query(models.Admin).filter(models.Admin.permissions.isnot(None)).all():
+            if not admin.permission_entries:
+                admin.set_permissions(json.loads(admin.permissions))
+        logger.info("Admin permissions backfilled.")
+
+        logger.info("Creating transaction totals index...")
+        db.execute(text("CREATE INDEX IF NOT EXISTS idx_transactions_user_status_type ON transactions(user_id, status, type)"))
+        logger.info("Index created successfully.")
+
+        # Convert security_alerts.resolved from 'true'/'false' strings to a boolean
+        if table_exists(db, "security_alerts", dialect):
+            resolved_type = get_column_type(db, "security_alerts", "resolved", dialect)
+            if resolved_type and resolved_type != "boolean":
+                logger.info("Converting security_alerts.resolved to boolean...")
+                db.execute(text("DROP INDEX IF EXISTS idx_security_alerts_resolved"))
+                # SQLite applies DDL immediately, so a rerun after a failure may find the column already added
+                if "resolved_flag" not in get_table_columns(db, "security_alerts", dialect):
+                    db.execute(text("ALTER TABLE security_alerts ADD COLUMN resolved_flag BOOLEAN NOT NULL DEFAULT FALSE"))
+                db.execute(text("UPDATE security_alerts SET resolved_flag = COALESCE(resolved = 'true', FALSE)"))
+                db.execute(text("ALTER TABLE security_alerts DROP COLUMN resolved"))
+                db.execute(text("ALTER TABLE security_alerts RENAME COLUMN resolved_flag TO resolved"))
+                logger.info("security_alerts.resolved converted.")
+
+        # SQLite can't add a constraint to an existing table; there it only exists on tables created from the models
+        if dialect != "sqlite":
+            exists = db.execute(text(
+                "SELECT 1 FROM information_schema.table_constraints "
+                "WHERE table_name = 'transactions' AND constraint_name = 'ck_transactions_amount_positive'"
+            )).fetchone()
+            if not exists:
+                # Existing rows would make the ALTER fail; report them for manual review instead
+                non_positive = db.execute(text("SELECT COUNT(*) FROM transactions WHERE amount <= 0")).scalar()
+                if non_positive:
+                    logger.warning(
+                        "Skipping positive amount check on transactions; %s rows have amount <= 0", non_positive
+                    )
+                else:
+                    logger.info("Adding positive amount check to transactions...")
+                    db.execute(text("ALTER TABLE transactions ADD CONSTRAINT ck_transactions_amount_positive CHECK (amount > 0)"))
+                    logger.info("Check constraint added.")
+
+        logger.info("Creating query indexes...")
+        db.execute(text("CREATE INDEX IF NOT EXISTS idx_transactions_user_created_at ON transactions(user_id, created_at)"))
+        db.execute(text("CREATE INDEX IF NOT EXISTS idx_transactions_created_at ON transactions(created_at)"))
+        db.execute(text("CREATE INDEX IF NOT EXISTS idx_transactions_user_provider ON transactions(user_id, provider)"))
+        db.execute(text("CREATE INDEX IF NOT EXISTS idx_transactions_transaction_id ON transactions(transaction_id)"))
+        # Duplicate hashes would make the unique index fail; they involve balances, so they are
+        # reported for manual review instead of being deleted here
+        duplicate_hashes = db.execute(text(
+            "SELECT transaction_hash, COUNT(*) FROM transactions WHERE transaction_hash IS NOT NULL "
+            "GROUP BY transaction_hash HAVING COUNT(*) > 1"
+        )).fetchall()
+        if duplicate_hashes:
+            logger.warning(
+                "Skipping unique index on transactions.transaction_hash; duplicate hashes found: %s",
+                ", ".join(f"{tx_hash} ({count} rows)" for tx_hash, count in duplicate_hashes)
+            )
+        else:
+            db.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_transactions_transaction_hash ON transactions(transaction_hash)"))
+        db.execute(text("CREATE INDEX IF NOT EXISTS idx_transactions_completed_created_at ON transactions(created_at) WHERE status = 'completed'"))
+        db.execute(text("CREATE INDEX IF NOT EXISTS idx_transactions_pending_created_at ON transactions(created_at) WHERE status = 'pending'"))
+        if table_exists(db, "web3_deposit_addresses", dialect):
+            db.execute(text("CREATE INDEX IF NOT EXISTS idx_web3_deposit_addresses_status_expires_at ON web3_deposit_addresses(status, expires_at)"))
+        if table_exists(db, "security_alerts", dialect):
+            open_predicate = "resolved = 0" if dialect == "sqlite" else "NOT resolved"
+            db.execute(text(f"CREATE INDEX IF NOT EXISTS idx_security_alerts_open_created_at ON security_alerts(created_at) WHERE {open_predicate}"))
+        logger.info("Indexes created successfully.")
+
         # Ensure user status values are set
         logger.info("Ensuring all users have active status...")
         db.execute(text("UPDATE users SET status = 'active' WHERE status IS NULL"))
@@ -33,10 +33,19 @@ class MobileMoneyConfig:
     ORANGE_DEPOSIT_FEE = 0.0  # No fee for deposits
     ORANGE_WITHDRAWAL_FEE = 50.0  # 50 XAF withdrawal fee
     
+    # Flat fee per (provider, transaction type), looked up directly by calculate_fee
+    FEES = {
+        ("MTN", "deposit"): MTN_DEPOSIT_FEE,
+        ("MTN", "withdrawal"): MTN_WITHDRAWAL_FEE,
+        ("ORANGE", "deposit"): ORANGE_DEPOSIT_FEE,
+        ("ORANGE", "withdrawal"): ORANGE_WITHDRAWAL_FEE,
+    }
+    
     # Phone Number Validation
     CAMEROON_COUNTRY_CODE = "237"
     MTN_PREFIXES = ["6", "7"]  # MTN Cameroon prefixes
     ORANGE_PREFIXES = ["6", "7"]  # Orange Cameroon prefixes
+    LOCAL_PREFIXES = tuple(MTN_PREFIXES + ORANGE_PREFIXES)  # Built once for startswith checks
     
     # Callback URLs
     MTN_CALLBACK_URL = os.getenv("MTN_CALLBACK_URL", "https://your-domain.com/api/mobile-money/mtn/callback")
@@ -83,17 +92,7 @@ class MobileMoneyConfig:
     @classmethod
     def calculate_fee(cls, amount: float, provider: str, transaction_type: str) -> float:
         """Calculate transaction fee"""
-        if provider.upper() == "MTN":
-            if transaction_type == "deposit":
-                return cls.MTN_DEPOSIT_FEE
-            elif transaction_type == "withdrawal":
-                return cls.MTN_WITHDRAWAL_FEE
-        elif provider.upper() == "ORANGE":
-            if transaction_type == "deposit":
-                return cls.ORANGE_DEPOSIT_FEE
-            elif transaction_type == "withdrawal":
-                return cls.ORANGE_WITHDRAWAL_FEE
-        return 0.0
+        return cls.FEES.get((provider.upper(), transaction_type), 0.0)
     
     @classmethod
     def validate_phone_number(cls, phone_number: str, provider: str) -> bool:
@@ -102,12 +101,12 @@ class MobileMoneyConfig:
         clean_number = ''.join(filter(str.isdigit, phone_number))
         
         # Check if it's a valid Cameroon number
-        if len(clean_number) == 9 and clean_number.startswith(tuple(cls.MTN_PREFIXES + cls.ORANGE_PREFIXES)):
+        if len(clean_number) == 9 and clean_number.startswith(cls.LOCAL_PREFIXES):
             return True
         elif len(clean_number) == 12 and clean_number.startswith(cls.CAMEROON_COUNTRY_CODE):
             # Remove country code and check
             local_number = clean_number[3:]
-            return local_number.startswith(tuple(cls.MTN_PREFIXES + cls.ORANGE_PREFIXES))
+            return local_number.startswith(cls.LOCAL_PREFIXES)
         
         return False
 